@@ -0,0 +1,69 @@
+import os
+
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+
+from auth.security import decode_access_token
+from cache import TTLCache
+from db import get_users_collection
+
+# Esquema de seguridad para obtener el token de la cabecera
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
+
+# Tokens ya verificados (firma + exp). Cada entrada vence a más tardar con el `exp` del token.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+# Usuarios por username; update_user y delete_user invalidan su entrada
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+credentials_error = HTTPException(
+    status_code=401,
+    detail="Token inválido o vencido",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def invalidate_user(username: str):
+    """
+    Saca al usuario de la caché; la próxima petición lo vuelve a leer de Mongo.
+    """
+    user_cache.pop(username)
+
+
+async def load_user(username: str):
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    user = await get_users_collection().find_one({"username": username}, {"password_hash": 0})
+    if user is None:
+        return None
+    user["_id"] = str(user["_id"])
+    user_cache.set(username, user)
+    return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Dependencia de las rutas protegidas: verifica el JWT y devuelve el usuario.
+    La firma se verifica una vez por token y el usuario se lee de la caché.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            claims = decode_access_token(token)
+        except JWTError:
+            raise credentials_error
+        if not claims.get("sub"):
+            raise credentials_error
+        token_cache.set(token, claims, expires_at=claims.get("exp"))
+
+    user = await load_user(claims["sub"])
+    if user is None:
+        # usuario borrado después de emitir el token
+        raise credentials_error
+    return user
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -13,6 +15,15 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # Contexto para hashing de contraseñas (aunque usaremos bcrypt directamente para verificar)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt tarda ~100-300 ms por llamada y libera el GIL, así que corre en un
+# pool de hilos propio: no ocupa el threadpool de FastAPI ni el event loop.
+# BCRYPT_CONCURRENCY limita cuántos hash/verificaciones corren a la vez;
+# el resto espera su turno en el semáforo sin bloquear otras peticiones.
+BCRYPT_CONCURRENCY = int(os.getenv("BCRYPT_CONCURRENCY", str(os.cpu_count() or 2)))
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_CONCURRENCY, thread_name_prefix="bcrypt")
+_bcrypt_slots = asyncio.Semaphore(BCRYPT_CONCURRENCY)
+
 def create_access_token(data: dict):
     """
     Crea un nuevo token de acceso JWT.
@@ -23,6 +34,13 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str) -> dict:
+    """
+    Verifica firma y vencimiento del JWT y devuelve sus claims.
+    Lanza JWTError si el token no es válido.
+    """
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifica una contraseña en texto plano contra un hash de bcrypt.
@@ -33,4 +51,23 @@ def hash_password(password: str) -> str:
     """
     Hashea una contraseña en texto plano usando bcrypt.
     """
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
\ No newline at end of file
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+async def _run_bcrypt(fn, *args):
+    async with _bcrypt_slots:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, fn, *args)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password en el pool de bcrypt, para usar desde rutas async.
+    """
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    hash_password en el pool de bcrypt, para usar desde rutas async.
+    """
+    return await _run_bcrypt(hash_password, password)
@@ -0,0 +1,67 @@
+"""
+Mide logins por segundo contra una API corriendo, con N clientes a la vez.
+
+Uso (necesita httpx: pip install httpx):
+    python bench_login.py --url http://localhost:8000 --email admin@gamc.bo \
+        --password secreto --concurrency 50 --requests 500
+
+Mientras corre se puede golpear otro endpoint (p.ej. /api/mongo/uploads)
+para comprobar que el resto de la API sigue respondiendo durante la tormenta
+de logins.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+
+async def worker(client, url, form, queue, latencies, failures):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        t0 = time.perf_counter()
+        response = await client.post(url, data=form)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            failures.append(response.status_code)
+
+
+async def bench(base_url: str, email: str, password: str, concurrency: int, total: int):
+    url = f"{base_url.rstrip('/')}/api/users/login"
+    form = {"username": email, "password": password}
+
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    latencies, failures = [], []
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, url, form, queue, latencies, failures)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - t0
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"logins:        {total} ({len(failures)} fallidos)")
+    print(f"concurrencia:  {concurrency}")
+    print(f"logins/s:      {total / elapsed:.1f}")
+    print(f"latencia (ms): p50 {p50 * 1000:.0f}  p95 {p95 * 1000:.0f}  p99 {p99 * 1000:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.email, args.password, args.concurrency, args.requests))
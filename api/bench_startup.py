@@ -0,0 +1,76 @@
+"""
+Mide cuánto tarda la API en importarse y en arrancar (lifespan), cada
+corrida en un proceso nuevo como un reinicio de uvicorn.
+
+Uso (desde api/):
+    python bench_startup.py --runs 10
+
+Con --ready también mide cuánto tarda /api/health/ready en dar 200 desde
+que arrancó el lifespan (necesita MySQL, Mongo y RabbitMQ levantados).
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+# Código de cada corrida: importa main, entra al lifespan y sale.
+RUN = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def run():
+    from routes import health
+    async with main.app.router.lifespan_context(main.app):
+        started = time.perf_counter()
+        ready = None
+        if {ready}:
+            from starlette.requests import Request
+            request = Request({{"type": "http", "app": main.app}})
+            while time.perf_counter() - started < {timeout}:
+                if health.ready(request).status_code == 200:
+                    ready = time.perf_counter() - started
+                    break
+                await asyncio.sleep(0.05)
+    return started, ready
+
+started, ready = asyncio.run(run())
+print(json.dumps({{"import": imported - t0, "startup": started - imported, "ready": ready}}))
+"""
+
+
+def run_once(ready: bool, timeout: float) -> dict:
+    code = RUN.format(ready=ready, timeout=timeout)
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code],
+                         capture_output=True, text=True, check=True).stdout
+    # la última línea es el resultado; antes puede haber prints de la API
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(name: str, samples: list):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        print(f"{name:<10} sin datos")
+        return
+    ms = np.array(samples) * 1000
+    p50, p95 = np.percentile(ms, [50, 95])
+    print(f"{name:<10} p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  max {ms.max():8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--ready", action="store_true")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    results = [run_once(args.ready, args.timeout) for _ in range(args.runs)]
+    print(f"corridas:  {args.runs}")
+    report("import", [r["import"] for r in results])
+    report("startup", [r["startup"] for r in results])
+    if args.ready:
+        report("ready", [r["ready"] for r in results])
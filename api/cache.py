@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Caché en memoria del proceso: cada entrada vence en su propio instante
+# y, si se llena, se descarta la usada hace más tiempo (LRU).
+# Con varios procesos de uvicorn cada uno tiene la suya; la invalidación
+# es local y el TTL acota cuánto puede durar un dato viejo en los demás.
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: float = None):
+        """
+        Guarda `value` hasta `expires_at` (epoch en segundos), sin pasar del TTL.
+        """
+        limit = time.time() + self.ttl
+        expires_at = limit if expires_at is None else min(expires_at, limit)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return None if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
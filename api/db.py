@@ -1,39 +1,248 @@
+import asyncio
+import os
+import threading
+
 import mysql.connector
-from mysql.connector import Error
-from pymongo import MongoClient
+from mysql.connector import Error, errors, pooling
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import PyMongoError
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Clientes de bases de datos de la API.
+# Nada se conecta al importar: el pool de MySQL y los clientes de Mongo se
+# crean la primera vez que se piden (o en el arranque en segundo plano, ver
+# warm_up) y se cierran en el lifespan de main.py. Así importar la app o
+# reiniciar uvicorn no espera a las bases, y una base lenta no demora el arranque.
+
+# --- Configuración (mismos valores que docker-compose por defecto) ---
+MYSQL_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "mysql"),            # nombre del servicio docker-compose
+    "port": int(os.getenv("MYSQL_PORT", "3306")),         # puerto interno del contenedor mysql
+    "user": os.getenv("MYSQL_USER", "root"),
+    "password": os.getenv("MYSQL_PASSWORD", "root123"),
+    "database": os.getenv("MYSQL_DATABASE", "etl_system"),
+}
+# Conexiones abiertas que se reutilizan entre peticiones. Si se agotan
+# (más rutas síncronas a la vez que el pool) se abre una conexión suelta.
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))
+# Espera entre intentos de llenar el pool en el arranque si MySQL no responde
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+
+# Lee la URI de la variable de entorno. Si no la encuentra, usa la de Docker por defecto.
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+# Base de datos para la autenticación de usuarios
+AUTH_DB = "EMERGENTES_Monitoreo_GAMC"
+# Base de datos para el sistema ETL
+ETL_DB = "etl_system"
+
+_mysql_lock = threading.Lock()
+_mongo_lock = threading.Lock()
+_mysql_pool = None
+_mysql_overflow = 0
+_mongo_client = None
+_async_mongo_client = None
+
 
-import os
 # --- MySQL ---
+class CountingPool(pooling.MySQLConnectionPool):
+    """
+    Pool de mysql-connector que cuenta sus conexiones prestadas, para
+    informar el uso sin leer el estado interno del pool.
+    """
+
+    def __init__(self, **kwargs):
+        self.in_use = 0
+        self._count_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def get_connection(self):
+        conn = super().get_connection()
+        with self._count_lock:
+            self.in_use += 1
+        return conn
+
+    def add_connection(self, cnx=None):
+        # con `cnx` es una conexión prestada que vuelve (PooledMySQLConnection.close)
+        if cnx is not None:
+            with self._count_lock:
+                self.in_use -= 1
+        super().add_connection(cnx)
+
+
+def init_mysql_pool():
+    """
+    Crea el pool de MySQL (una sola vez por proceso). Abre MYSQL_POOL_SIZE
+    conexiones: si MySQL no responde lanza el error y se reintenta en la
+    próxima petición.
+    """
+    global _mysql_pool
+    with _mysql_lock:
+        if _mysql_pool is None:
+            # pool_reset_session (por defecto) limpia la sesión al devolver la
+            # conexión, por si una ruta dejó una transacción abierta
+            _mysql_pool = CountingPool(
+                pool_name=f"etl_api_{os.getpid()}",
+                pool_size=MYSQL_POOL_SIZE,
+                **MYSQL_CONFIG
+            )
+    return _mysql_pool
+
+
 def get_mysql_conn():
     """
-    Devuelve una conexión viva a MySQL dentro de Docker.
-    Acordate de cerrar la conexión cuando termines de usarla.
+    Devuelve una conexión a MySQL del pool, o None si no se pudo conectar.
+    Acordate de cerrar la conexión cuando termines de usarla:
+    `conn.close()` la devuelve al pool.
     """
+    global _mysql_overflow
     try:
-        conn = mysql.connector.connect(
-            host="mysql",            # nombre del servicio docker-compose
-            port=3306,               # puerto interno del contenedor mysql
-            user="root",
-            password="root123",
-            database="etl_system"
-        )
-        return conn
+        pool = _mysql_pool or init_mysql_pool()
+        return pool.get_connection()
+    except errors.PoolError:
+        # pool agotado: conexión suelta, close() la cierra de verdad
+        _mysql_overflow += 1
+        try:
+            return mysql.connector.connect(**MYSQL_CONFIG)
+        except Error as e:
+            print("Error conectando a MySQL:", e)
+            return None
     except Error as e:
         print("Error conectando a MySQL:", e)
         return None
 
+
+def mysql_pool_status() -> dict:
+    """
+    Estado del pool sin abrir conexiones (para /api/health/ready).
+    `idle` son las conexiones del pool que no están prestadas.
+    """
+    if _mysql_pool is None:
+        return {"ready": False, "size": MYSQL_POOL_SIZE, "idle": 0, "in_use": 0,
+                "overflow": _mysql_overflow}
+    in_use = _mysql_pool.in_use
+    return {"ready": True, "size": _mysql_pool.pool_size, "idle": _mysql_pool.pool_size - in_use,
+            "in_use": in_use, "overflow": _mysql_overflow}
+
+
+def close_mysql_pool():
+    """
+    Cierra las conexiones libres del pool al apagar la API: se piden hasta
+    vaciarlo y se desconectan en vez de devolverlas (close() las devolvería).
+    """
+    global _mysql_pool
+    with _mysql_lock:
+        if _mysql_pool is not None:
+            while True:
+                try:
+                    conn = _mysql_pool.get_connection()
+                except errors.PoolError:
+                    break
+                except Error as e:
+                    # el pool reconecta las conexiones caídas antes de prestarlas:
+                    # si MySQL no responde, las que quedan ya están desconectadas
+                    print("Error cerrando el pool de MySQL:", e)
+                    break
+                try:
+                    conn.disconnect()
+                except Error as e:
+                    print("Error cerrando el pool de MySQL:", e)
+            _mysql_pool = None
+
+
 # --- Mongo ---
-# Lee la URI de la variable de entorno. Si no la encuentra, usa la de Docker por defecto.
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+def get_mongo_client() -> MongoClient:
+    """
+    Cliente síncrono compartido (rutas def). MongoClient no bloquea al
+    crearse: conecta en segundo plano y espera recién en la primera operación.
+    """
+    global _mongo_client
+    with _mongo_lock:
+        if _mongo_client is None:
+            _mongo_client = MongoClient(MONGO_URI)
+    return _mongo_client
+
+
+def get_async_mongo_client() -> AsyncIOMotorClient:
+    """
+    Cliente async compartido (rutas de usuarios). Hay que pedirlo dentro del event loop.
+    """
+    global _async_mongo_client
+    if _async_mongo_client is None:
+        _async_mongo_client = AsyncIOMotorClient(MONGO_URI)
+    return _async_mongo_client
+
+
+def get_uploads_collection():
+    return get_mongo_client()[ETL_DB]["uploads"]
+
+
+def get_users_collection():
+    return get_async_mongo_client()[AUTH_DB]["users"]
+
 
-# Creamos el cliente global una sola vez
-mongo_client = MongoClient(MONGO_URI)
+def mongo_status(client) -> dict:
+    """
+    Lo que sabe el monitor del driver sobre los servidores (no hace consultas).
+    """
+    if client is None:
+        return {"ready": False, "servers": []}
+    topology = client.topology_description
+    return {
+        "ready": topology.has_readable_server(),
+        "servers": [
+            {"address": f"{host}:{port}", "type": server.server_type_name}
+            for (host, port), server in topology.server_descriptions().items()
+        ],
+    }
+
+
+def mongo_clients_status() -> dict:
+    async_client = _async_mongo_client.delegate if _async_mongo_client is not None else None
+    return {"sync": mongo_status(_mongo_client), "async": mongo_status(async_client)}
+
+
+def close_mongo_clients():
+    global _mongo_client, _async_mongo_client
+    with _mongo_lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+        if _async_mongo_client is not None:
+            _async_mongo_client.close()
+        _mongo_client = None
+        _async_mongo_client = None
+
+
+async def ensure_user_indexes():
+    """
+    Índices únicos de usuarios: búsquedas por email/username en O(log n)
+    y la base rechaza duplicados aunque dos altas lleguen a la vez.
+    """
+    users_collection = get_users_collection()
+    try:
+        await users_collection.create_index([("email", ASCENDING)], unique=True)
+        await users_collection.create_index([("username", ASCENDING)], unique=True)
+    except PyMongoError as e:
+        # p.ej. ya hay duplicados en la colección: se sigue sin el índice
+        print("Error creando índices de usuarios:", e)
+
+
+async def warm_up():
+    """
+    Arranque en segundo plano (lo lanza el lifespan sin esperarlo): crea los
+    clientes, llena el pool de MySQL y los índices de usuarios. La API ya
+    atiende mientras tanto; /api/health/ready dice cuándo terminó.
+    """
+    get_mongo_client()
+    get_async_mongo_client()
+    # Mongo y MySQL en paralelo: una base caída no demora a la otra
+    await asyncio.gather(_fill_mysql_pool(), ensure_user_indexes())
 
-# --- Base de datos para la autenticación de usuarios ---
-# Apuntamos a la base de datos y colección correctas donde están los usuarios.
-auth_db = mongo_client["EMERGENTES_Monitoreo_GAMC"]
-mongo_collection = auth_db["users"]
 
-# --- Base de datos para el sistema ETL (si es diferente) ---
-etl_db = mongo_client["etl_system"]
-uploads_collection = etl_db["uploads"]
+async def _fill_mysql_pool():
+    while True:
+        try:
+            await asyncio.to_thread(init_mysql_pool)
+            return
+        except Error as e:
+            print("Error conectando a MySQL:", e)
+            await asyncio.sleep(WARM_UP_RETRY_SECONDS)
@@ -1,11 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import user, upload, status, data 
+from routes import user, upload, status, data, simulate, rollups, health, files
+from websocket import hub as realtime
+from websocket.broker import EventBridge
+import db
+import metrics
+import producer
+import response_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque y apagado de la API. El arranque no espera a las bases: el pool
+    de MySQL, los clientes de Mongo y los índices se preparan en segundo
+    plano (db.warm_up) y /api/health/ready avisa cuando están listos.
+    """
+    # Eventos del worker (RabbitMQ) -> hub de WebSocket
+    event_bridge = EventBridge(realtime.hub)
+    event_bridge.start(asyncio.get_running_loop())
+    app.state.event_bridge = event_bridge
+    # los archivos que termina el worker invalidan las respuestas cacheadas
+    realtime.hub.add_listener(response_cache.on_event)
+    warm_up = asyncio.create_task(db.warm_up())
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        realtime.hub.remove_listener(response_cache.on_event)
+        event_bridge.stop()
+        await asyncio.to_thread(producer.close)
+        await asyncio.to_thread(db.close_mysql_pool)
+        db.close_mongo_clients()
+
 
 app = FastAPI(
     title="API de Monitoreo GAMC",
     description="API para la gestión de usuarios y datos del sistema de monitoreo.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Orígenes permitidos para CORS. En producción, deberías ser más restrictivo.
@@ -35,3 +71,22 @@ app.include_router(status.router, prefix="/api")
 
 # Nuevo endpoint de data
 app.include_router(data.router, prefix="/api")
+
+# Agregados por sensor para los gráficos del dashboard
+app.include_router(rollups.router, prefix="/api")
+
+# Archivos de inbound/processed, también los ya archivados por la retención
+app.include_router(files.router, prefix="/api")
+
+# Simulador de sensores para pruebas de carga
+app.include_router(simulate.router, prefix="/api")
+
+# Métricas Prometheus (/api/metrics) y latencia de cada petición
+app.include_router(metrics.router, prefix="/api")
+app.middleware("http")(metrics.track_requests)
+
+# Sondas de salud (/api/health/live y /api/health/ready)
+app.include_router(health.router, prefix="/api")
+
+# WebSocket en tiempo real (/api/ws)
+app.include_router(realtime.router, prefix="/api")
@@ -0,0 +1,101 @@
+import os
+import time
+
+from fastapi import APIRouter, Request, Response
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                               Histogram, generate_latest)
+from prometheus_client import multiprocess
+
+# Métricas Prometheus de la API, en /api/metrics.
+# Con varios procesos de uvicorn/gunicorn se define PROMETHEUS_MULTIPROC_DIR
+# y cada proceso escribe ahí sus valores; /api/metrics los suma.
+# Las del worker las expone su propio exportador (worker/metrics.py).
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+router = APIRouter(tags=["metrics"])
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+                   60, 120, 300)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "Latencia de cada petición HTTP",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+UPLOAD_STAGE_SECONDS = Histogram(
+    "upload_stage_seconds",
+    "Tiempo por archivo de cada etapa de /upload (receive, hash, disk_write, claim, send_task)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+UPLOAD_BYTES_PER_SECOND = Histogram(
+    "upload_bytes_per_second",
+    "Velocidad de recepción de cada archivo subido",
+    buckets=(1e4, 1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9),
+)
+UPLOAD_SIZE_BYTES = Histogram(
+    "upload_size_bytes",
+    "Tamaño de los archivos subidos",
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 1.6e7, 1e8, 1e9, 5e9),
+)
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests",
+    "Peticiones a rutas con caché de respuesta (hit, miss, not_modified)",
+    ["group", "result"],
+)
+
+
+class StageTimer:
+    """
+    Acumula el tiempo de una etapa que se repite por bloque
+    (p.ej. escribir cada bloque) y lo registra una vez por archivo.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self._t0
+        return False
+
+    def observe(self):
+        UPLOAD_STAGE_SECONDS.labels(self.stage).observe(self.seconds)
+
+
+async def track_requests(request: Request, call_next):
+    """
+    Middleware HTTP: latencia por ruta (la plantilla, p.ej. /api/jobs/{job_id},
+    no la URL con ids, para no crear una serie por tarea).
+    """
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUEST_SECONDS.labels(request.method, path, str(status)).observe(time.perf_counter() - t0)
+
+
+def render() -> bytes:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus.
+    """
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+import metrics
+from cache import TTLCache
+
+# Respuestas de los endpoints que el frontend consulta cada pocos segundos
+# (/api/mongo/uploads, /api/mysql/ping, GET /api/users).
+# Se guarda el cuerpo JSON ya serializado con su ETag (sha1 del cuerpo):
+# mientras la entrada vale no se consulta la base ni se serializa nada, y si
+# el cliente manda If-None-Match con ese ETag se responde 304 sin cuerpo.
+#
+# Cada grupo ("uploads", "users") tiene una generación que forma parte de la
+# clave; invalidar es pasar a la siguiente (las entradas viejas ya no se
+# encuentran y las saca el LRU o el TTL). "uploads" se invalida con el evento
+# "done" del worker, que llega por el hub a todos los procesos de la API;
+# "users" con el alta, edición o baja de un usuario, solo en el proceso que
+# la atendió: en los demás el dato viejo dura como mucho RESPONSE_CACHE_TTL.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+_cache = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+_generations = {}
+
+
+def invalidate(group: str):
+    _generations[group] = _generations.get(group, 0) + 1
+
+
+def on_event(topic: str, message: dict):
+    """
+    Listener del hub: un archivo terminado agrega filas a upload_logs y uploads.
+    """
+    if message.get("type") == "done" and (message.get("data") or {}).get("status") == "ok":
+        invalidate("uploads")
+
+
+def cache_key(group: str, request: Request) -> tuple:
+    # la generación se toma antes de consultar: si se invalida mientras tanto,
+    # lo leído queda guardado con la generación vieja y no se sirve
+    return (group, _generations.get(group, 0), request.url.path,
+            tuple(sorted(request.query_params.multi_items())))
+
+
+def encode(content) -> tuple:
+    """
+    (cuerpo, etag) con la misma serialización que JSONResponse.
+    """
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def respond(request: Request, group: str, entry: tuple, result: str) -> Response:
+    body, etag = entry
+    # no-cache: el navegador guarda la respuesta pero pregunta siempre con If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        metrics.RESPONSE_CACHE_REQUESTS.labels(group, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    metrics.RESPONSE_CACHE_REQUESTS.labels(group, result).inc()
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cached_json(request: Request, group: str, build) -> Response:
+    """
+    Respuesta cacheada de una ruta síncrona; `build()` arma el contenido
+    (dict, lista o modelos) solo si no hay entrada vigente.
+    """
+    key = cache_key(group, request)
+    entry = _cache.get(key)
+    if entry is not None:
+        return respond(request, group, entry, "hit")
+    entry = encode(build())
+    _cache.set(key, entry)
+    return respond(request, group, entry, "miss")
+
+
+async def cached_json_async(request: Request, group: str, build) -> Response:
+    """
+    Lo mismo para rutas async: `build()` es una corrutina.
+    """
+    key = cache_key(group, request)
+    entry = _cache.get(key)
+    if entry is not None:
+        return respond(request, group, entry, "hit")
+    entry = encode(await build())
+    _cache.set(key, entry)
+    return respond(request, group, entry, "miss")
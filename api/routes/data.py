@@ -1,48 +1,196 @@
-from fastapi import APIRouter, HTTPException
-from db import get_mysql_conn, mongo_collection
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+import response_cache
+from db import get_mysql_conn, get_uploads_collection
 
 router = APIRouter(tags=["data"])
 
+# Filas que se piden por vuelta al cursor del servidor en la exportación
+EXPORT_FETCH_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+_upload_logs_ready = False
+_uploads_indexes_ready = False
+
+
+def _ensure_upload_logs(cursor):
+    """
+    Crea la tabla de logs si todavía no existe (una sola vez por proceso).
+    Los índices de tablas ya existentes los agrega el worker al arrancar.
+    """
+    global _upload_logs_ready
+    if _upload_logs_ready:
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS upload_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            filename VARCHAR(255),
+            rows_in INT,
+            rows_ok INT,
+            rows_rejected INT,
+            processed_at DATETIME,
+            INDEX idx_upload_logs_filename (filename, id),
+            INDEX idx_upload_logs_processed_at (processed_at)
+        )
+    """)
+    _upload_logs_ready = True
+
+
+def _ensure_uploads_indexes():
+    """
+    Índices de la colección uploads para filtrar y paginar por _id
+    (create_index no hace nada si ya existen).
+    """
+    global _uploads_indexes_ready
+    if _uploads_indexes_ready:
+        return
+    uploads_collection = get_uploads_collection()
+    uploads_collection.create_index([("filename", 1), ("_id", -1)])
+    uploads_collection.create_index([("logged_at", -1), ("_id", -1)])
+    _uploads_indexes_ready = True
+
+
+def ndjson_response(rows):
+    """
+    Respuesta NDJSON: una línea JSON por fila, a medida que el generador las produce.
+    """
+    lines = (json.dumps(row, default=str) + "\n" for row in rows)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+def upload_log_row(r) -> dict:
+    return {
+        "id": r[0],
+        "filename": r[1],
+        "rows_in": r[2],
+        "rows_ok": r[3],
+        "rows_rejected": r[4],
+        "processed_at": r[5].isoformat() if r[5] else None,
+    }
+
+
+def to_utc(value: datetime) -> datetime:
+    """
+    Fecha del query string en UTC; sin zona horaria se toma como UTC
+    (la hora de los contenedores).
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def logged_at_iso(value):
+    # pymongo devuelve las fechas BSON sin zona horaria, en UTC
+    if isinstance(value, datetime):
+        return to_utc(value).isoformat()
+    return value
+
+
+def upload_doc(doc) -> dict:
+    return {
+        "id": str(doc.get("_id")),
+        "filename": doc.get("filename"),
+        "rows_in": doc.get("rows_in"),
+        "rows_ok": doc.get("rows_ok"),
+        "rows_rejected": doc.get("rows_rejected"),
+        "output_file": doc.get("output_file"),
+        "deadletter_file": doc.get("deadletter_file"),
+        "logged_at": logged_at_iso(doc.get("logged_at")),
+    }
+
+
 @router.get("/mysql/ping")
-def mysql_ping():
+def mysql_ping(
+    request: Request,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int | None = Query(None, description="id de la última fila de la página anterior"),
+    filename: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
     """
-    Ejemplo simple: leer datos desde MySQL.
-    Puedes cambiar esto para leer tu propia tabla.
+    Logs de MySQL.upload_logs, del más nuevo al más viejo.
+    Paginación por cursor (keyset): pasar `next_cursor` como `cursor`
+    para la página siguiente. Con format=ndjson se exportan todas las filas
+    que cumplen los filtros, sin límite y sin cargarlas en memoria.
+    Las páginas JSON salen de la caché de respuestas (con ETag) hasta que
+    el worker termina otro archivo.
     """
+    conditions, params = [], []
+    if cursor is not None:
+        conditions.append("id < %s")
+        params.append(cursor)
+    if filename:
+        conditions.append("filename = %s")
+        params.append(filename)
+    # processed_at es DATETIME sin zona, en UTC (la hora de los contenedores)
+    if date_from:
+        conditions.append("processed_at >= %s")
+        params.append(to_utc(date_from).replace(tzinfo=None))
+    if date_to:
+        conditions.append("processed_at < %s")
+        params.append(to_utc(date_to).replace(tzinfo=None))
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    query = f"SELECT id, filename, rows_in, rows_ok, rows_rejected, processed_at FROM upload_logs {where}ORDER BY id DESC"
+
+    if format == "ndjson":
+        return ndjson_response(_export_upload_logs(query, params))
+
+    return response_cache.cached_json(
+        request, "uploads", lambda: _upload_logs_page(query, params, limit)
+    )
+
+
+def _upload_logs_page(query: str, params: list, limit: int) -> dict:
     conn = get_mysql_conn()
     if conn is None:
         raise HTTPException(status_code=500, detail="No se pudo conectar a MySQL")
 
     try:
-        cursor = conn.cursor()
-        # Creamos tabla de ejemplo si no existe
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS upload_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                filename VARCHAR(255),
-                rows_in INT,
-                processed_at DATETIME
-            )
-        """)
-        conn.commit()
-
-        # Leemos todas las filas
-        cursor.execute("SELECT id, filename, rows_in, processed_at FROM upload_logs ORDER BY id DESC")
-        rows = cursor.fetchall()
-
-        # Convertimos a objetos JSON-friendly
-        result = [
-            {
-                "id": r[0],
-                "filename": r[1],
-                "rows_in": r[2],
-                "processed_at": r[3].isoformat() if r[3] else None,
-            }
-            for r in rows
-        ]
-
-        return {"ok": True, "data": result}
+        db_cursor = conn.cursor()
+        _ensure_upload_logs(db_cursor)
+
+        # una fila de más para saber si hay otra página
+        db_cursor.execute(f"{query} LIMIT %s", (*params, limit + 1))
+        rows = db_cursor.fetchall()
+
+        result = [upload_log_row(r) for r in rows[:limit]]
+        next_cursor = result[-1]["id"] if len(rows) > limit else None
+
+        return {"ok": True, "data": result, "next_cursor": next_cursor}
+
+    finally:
+        conn.close()
+
 
+def _export_upload_logs(query: str, params: list):
+    """
+    Recorre el resultado con un cursor sin buffer: las filas se leen del
+    servidor de a EXPORT_FETCH_SIZE mientras se envían.
+    La conexión se pide recién cuando empieza el cuerpo: si el cliente corta
+    antes, no queda una conexión del pool tomada por un generador que nunca corre.
+    """
+    conn = get_mysql_conn()
+    if conn is None:
+        # la respuesta ya empezó con 200: se corta el cuerpo y el cliente ve la exportación incompleta
+        raise RuntimeError("No se pudo conectar a MySQL para exportar upload_logs")
+    try:
+        db_cursor = conn.cursor(buffered=False)
+        _ensure_upload_logs(db_cursor)
+        db_cursor.execute(query, params)
+        while True:
+            rows = db_cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for r in rows:
+                yield upload_log_row(r)
     finally:
         conn.close()
 
@@ -55,9 +203,11 @@ def save_upload_metadata(filename: str, rows_in: int, output_file: str):
     doc = {
         "filename": filename,
         "rows_in": rows_in,
-        "output_file": output_file
+        "output_file": output_file,
+        "logged_at": datetime.now(timezone.utc)
     }
-    insert_result = mongo_collection.insert_one(doc)
+    insert_result = get_uploads_collection().insert_one(doc)
+    response_cache.invalidate("uploads")
 
     return {
         "ok": True,
@@ -65,17 +215,46 @@ def save_upload_metadata(filename: str, rows_in: int, output_file: str):
         "stored": doc
     }
 @router.get("/mongo/uploads")
-def list_uploads():
-    """
-    Devuelve todos los documentos guardados en MongoDB por el worker.
-    """
-    docs = []
-    for doc in mongo_collection.find():
-        docs.append({
-            "id": str(doc.get("_id")),
-            "filename": doc.get("filename"),
-            "rows_in": doc.get("rows_in"),
-            "output_file": doc.get("output_file"),
-            "logged_at": doc.get("logged_at"),
-        })
-    return {"ok": True, "uploads": docs}
\ No newline at end of file
+def list_uploads(
+    request: Request,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="id del último documento de la página anterior"),
+    filename: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Documentos de uploads guardados por el worker, del más nuevo al más viejo.
+    Misma paginación, filtros, exportación NDJSON y caché que /mysql/ping.
+    """
+    query = {}
+    if cursor:
+        try:
+            query["_id"] = {"$lt": ObjectId(cursor)}
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="cursor inválido")
+    if filename:
+        query["filename"] = filename
+    # logged_at es una fecha BSON en UTC: se compara contra fechas, no texto
+    if date_from or date_to:
+        query["logged_at"] = {}
+        if date_from:
+            query["logged_at"]["$gte"] = to_utc(date_from)
+        if date_to:
+            query["logged_at"]["$lt"] = to_utc(date_to)
+
+    if format == "ndjson":
+        _ensure_uploads_indexes()
+        found = get_uploads_collection().find(query).sort("_id", -1).batch_size(EXPORT_FETCH_SIZE)
+        return ndjson_response(upload_doc(doc) for doc in found)
+
+    return response_cache.cached_json(request, "uploads", lambda: _uploads_page(query, limit))
+
+
+def _uploads_page(query: dict, limit: int) -> dict:
+    _ensure_uploads_indexes()
+    found = get_uploads_collection().find(query).sort("_id", -1).limit(limit + 1)
+    docs = [upload_doc(doc) for doc in found]
+    next_cursor = docs[limit - 1]["id"] if len(docs) > limit else None
+    return {"ok": True, "uploads": docs[:limit], "next_cursor": next_cursor}
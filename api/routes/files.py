@@ -0,0 +1,136 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from mysql.connector import Error
+
+from db import get_mysql_conn
+from routes.upload import INBOUND_DIR, PROCESSED_DIR
+
+router = APIRouter(prefix="/files", tags=["files"])
+
+# Archivos de /data/inbound y /data/processed por su ruta original (la que
+# guardan output_file en Mongo.uploads y MySQL.task_states), estén todavía
+# en su carpeta o ya archivados por worker/retention.py.
+ALLOWED_DIRS = {os.path.realpath(INBOUND_DIR), os.path.realpath(PROCESSED_DIR)}
+MEDIA_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+_archived_files_ready = False
+
+
+def _ensure_archived_files(cursor):
+    """
+    Crea el índice de archivados si el worker todavía no lo creó (una sola vez por proceso).
+    """
+    global _archived_files_ready
+    if _archived_files_ready:
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archived_files (
+            original_path VARCHAR(512) PRIMARY KEY,
+            kind VARCHAR(16),
+            archive_path VARCHAR(1024),
+            compression VARCHAR(8),
+            original_bytes BIGINT,
+            archived_bytes BIGINT,
+            modified_at DATETIME,
+            archived_at DATETIME,
+            pruned_at DATETIME NULL,
+            INDEX idx_archived_files_archived_at (pruned_at, archived_at)
+        )
+    """)
+    _archived_files_ready = True
+
+
+def check_path(path: str) -> str:
+    """
+    Solo archivos directamente dentro de inbound o processed (sin ../ ni otras carpetas).
+    """
+    path = os.path.normpath(path)
+    if os.path.dirname(os.path.realpath(path)) not in ALLOWED_DIRS:
+        raise HTTPException(status_code=400, detail="Ruta fuera de /data/inbound y /data/processed")
+    return path
+
+
+def lookup(path: str):
+    conn = get_mysql_conn()
+    if conn is None:
+        raise HTTPException(status_code=500, detail="No se pudo conectar a MySQL")
+    try:
+        cursor = conn.cursor(dictionary=True)
+        _ensure_archived_files(cursor)
+        cursor.execute(
+            "SELECT original_path, kind, archive_path, compression, original_bytes, "
+            "archived_bytes, archived_at, pruned_at FROM archived_files WHERE original_path = %s",
+            (path,)
+        )
+        return cursor.fetchone()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo leer el índice de archivados: {e}")
+    finally:
+        conn.close()
+
+
+def resolve_path(path: str) -> dict:
+    """
+    state: live (sigue en su carpeta), archived, pruned (borrado por la
+    retención) o missing (nunca se archivó).
+    """
+    if os.path.exists(path):
+        return {"path": path, "state": "live", "bytes": os.path.getsize(path)}
+    entry = lookup(path)
+    if entry is None:
+        return {"path": path, "state": "missing"}
+    return {
+        "path": path,
+        "state": "pruned" if entry["pruned_at"] else "archived",
+        "archive_path": entry["archive_path"],
+        "compression": entry["compression"],
+        "original_bytes": entry["original_bytes"],
+        "archived_bytes": entry["archived_bytes"],
+        "archived_at": entry["archived_at"].isoformat() if entry["archived_at"] else None,
+        "pruned_at": entry["pruned_at"].isoformat() if entry["pruned_at"] else None,
+    }
+
+
+def accepts_encoding(request: Request, encoding: str) -> bool:
+    header = request.headers.get("accept-encoding", "")
+    return encoding in (token.split(";")[0].strip() for token in header.split(","))
+
+
+@router.get("/resolve")
+def resolve_file(path: str):
+    """
+    Dónde está hoy el contenido de un output_file (o un CSV de inbound).
+    """
+    return {"ok": True, **resolve_path(check_path(path))}
+
+
+@router.get("/download")
+def download_file(path: str, request: Request):
+    """
+    Descarga el archivo aunque ya esté archivado. Si lo comprimió la
+    retención y el cliente acepta ese Content-Encoding (gzip o zstd), se
+    envía comprimido y el cliente lo recibe como el original; si no, se
+    descarga el archivo comprimido con su propio nombre.
+    """
+    path = check_path(path)
+    resolved = resolve_path(path)
+    if resolved["state"] == "missing":
+        raise HTTPException(status_code=404, detail="El archivo no existe")
+    if resolved["state"] == "pruned":
+        raise HTTPException(status_code=410, detail="El archivo fue borrado por la retención")
+    if resolved["state"] == "live":
+        return FileResponse(path, filename=os.path.basename(path))
+
+    archive_path = resolved["archive_path"]
+    compression = resolved["compression"]
+    # archivos que ya llegaron comprimidos (.csv.gz, .parquet) se guardaron tal cual
+    recompressed = os.path.basename(archive_path) != os.path.basename(path)
+    if not os.path.exists(archive_path):
+        raise HTTPException(status_code=404, detail="Falta el archivo archivado")
+    if recompressed and accepts_encoding(request, compression):
+        return FileResponse(archive_path, filename=os.path.basename(path),
+                            headers={"Content-Encoding": compression})
+    return FileResponse(archive_path, filename=os.path.basename(archive_path),
+                        media_type=MEDIA_TYPES.get(compression) if recompressed else None)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+import producer
+from db import mongo_clients_status, mysql_pool_status
+
+# Sondas para docker/k8s. Ninguna abre conexiones ni consulta las bases:
+# leen el estado del pool de MySQL, del monitor del driver de Mongo y del
+# puente de eventos con RabbitMQ, así un chequeo cada pocos segundos no
+# le quita conexiones a las peticiones.
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+def live():
+    """
+    El proceso responde (no mira dependencias).
+    """
+    return {"ok": True}
+
+
+@router.get("/ready")
+def ready(request: Request):
+    """
+    200 si la API puede atender: pool de MySQL lleno, Mongo con un servidor
+    disponible y conexión con RabbitMQ. 503 mientras arranca o si falta alguno.
+    """
+    bridge = getattr(request.app.state, "event_bridge", None)
+    checks = {
+        "mysql": mysql_pool_status(),
+        "mongo": mongo_clients_status(),
+        "broker": {
+            "ready": bridge is not None and bridge.connected,
+            "producer": producer.pool_status(),
+        },
+    }
+    ok = (checks["mysql"]["ready"] and checks["mongo"]["sync"]["ready"]
+          and checks["mongo"]["async"]["ready"] and checks["broker"]["ready"])
+    return JSONResponse({"ok": ok, "checks": checks}, status_code=200 if ok else 503)
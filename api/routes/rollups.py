@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException, Query
+from mysql.connector import Error
+
+from db import get_mysql_conn
+
+router = APIRouter(tags=["rollups"])
+
+# Segundos de cada resolución de MySQL.sensor_rollups (la llena el worker, ver worker/rollups.py)
+RESOLUTION_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+# Puntos por serie que pide un gráfico si no se indica otra cosa
+DEFAULT_MAX_POINTS = 1000
+
+_sensor_rollups_ready = False
+
+
+def _ensure_sensor_rollups(cursor):
+    """
+    Crea la tabla de agregados si el worker todavía no la creó (una sola vez por proceso).
+    """
+    global _sensor_rollups_ready
+    if _sensor_rollups_ready:
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sensor_rollups (
+            resolution VARCHAR(8),
+            sensor_id VARCHAR(64),
+            metric VARCHAR(64),
+            bucket_start DATETIME,
+            count BIGINT,
+            min_value DOUBLE,
+            max_value DOUBLE,
+            sum_value DOUBLE,
+            PRIMARY KEY (resolution, sensor_id, metric, bucket_start)
+        )
+    """)
+    _sensor_rollups_ready = True
+
+
+def pick_resolution(date_from: datetime, date_to: datetime, max_points: int) -> str:
+    """
+    La resolución más fina que no pasa de `max_points` puntos en el rango
+    (con 1000 puntos: un día o 30 días -> hour, un año -> day). Si ni
+    siquiera day alcanza se usa day igual, la más gruesa que hay.
+    """
+    span = (date_to - date_from).total_seconds()
+    for resolution, seconds in RESOLUTION_SECONDS.items():
+        if span / seconds <= max_points:
+            return resolution
+    return "day"
+
+
+def to_utc(value: datetime) -> datetime:
+    # los agregados se guardan en UTC sin zona
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_floor(value: datetime, resolution: str) -> datetime:
+    """
+    Inicio del bucket que contiene `value` (para no perder el primer bucket del rango).
+    """
+    if resolution == "minute":
+        return value.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@router.get("/sensors/{sensor_id}/rollups")
+def get_sensor_rollups(
+    sensor_id: str,
+    date_from: datetime,
+    date_to: datetime,
+    metric: str | None = None,
+    resolution: str = Query("auto", pattern="^(auto|minute|hour|day)$"),
+    max_points: int = Query(DEFAULT_MAX_POINTS, ge=1, le=100000),
+):
+    """
+    Serie de un sensor (count, min, max, mean por bucket) leída de los
+    agregados, sin recorrer los registros. Con resolution=auto se usa la
+    resolución más fina que no pasa de `max_points` puntos en el rango
+    (ver pick_resolution).
+    """
+    date_from, date_to = to_utc(date_from), to_utc(date_to)
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="date_to tiene que ser posterior a date_from")
+    if resolution == "auto":
+        resolution = pick_resolution(date_from, date_to, max_points)
+
+    conditions = ["resolution = %s", "sensor_id = %s", "bucket_start >= %s", "bucket_start < %s"]
+    params = [resolution, sensor_id, bucket_floor(date_from, resolution), date_to]
+    if metric:
+        conditions.append("metric = %s")
+        params.append(metric)
+
+    conn = get_mysql_conn()
+    if conn is None:
+        raise HTTPException(status_code=500, detail="No se pudo conectar a MySQL")
+
+    try:
+        cursor = conn.cursor()
+        _ensure_sensor_rollups(cursor)
+        cursor.execute(
+            "SELECT metric, bucket_start, count, min_value, max_value, sum_value "
+            f"FROM sensor_rollups WHERE {' AND '.join(conditions)} ORDER BY metric, bucket_start",
+            tuple(params)
+        )
+        rows = cursor.fetchall()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"No se pudieron leer los agregados: {e}")
+    finally:
+        conn.close()
+
+    series = {}
+    for metric_name, bucket_start, count, min_value, max_value, sum_value in rows:
+        series.setdefault(metric_name, []).append({
+            "t": bucket_start.isoformat(),
+            "count": count,
+            "min": min_value,
+            "max": max_value,
+            "mean": sum_value / count if count else None,
+        })
+
+    return {
+        "ok": True,
+        "sensor_id": sensor_id,
+        "resolution": resolution,
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "series": series,
+    }
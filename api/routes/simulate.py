@@ -0,0 +1,247 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from routes.upload import ingest
+from websocket import hub as realtime
+
+# Simulador de sensores del lado del servidor: genera lotes CSV y los manda
+# por el mismo camino que /api/upload (guardar, deduplicar, encolar al worker).
+# Con los eventos del worker que llegan al hub mide la latencia de punta a punta:
+#   aceptado -> primer registro persistido -> tarea terminada
+# Sirve como prueba de carga sostenida de todo el pipeline.
+
+SIM_MAX_RATE = float(os.getenv("SIM_MAX_RATE", "50"))
+SIM_MAX_BATCH_ROWS = int(os.getenv("SIM_MAX_BATCH_ROWS", "1000000"))
+# Muestras de latencia que se guardan para los percentiles
+SIM_WINDOW = int(os.getenv("SIM_WINDOW", "2000"))
+# Tareas sin evento "done" después de este tiempo se dan por perdidas
+SIM_TASK_TIMEOUT = float(os.getenv("SIM_TASK_TIMEOUT", "600"))
+
+router = APIRouter(prefix="/simulate", tags=["simulate"])
+
+
+class SimulationConfig(BaseModel):
+    rate: float = Field(1.0, gt=0, le=SIM_MAX_RATE, description="Lotes por segundo")
+    batch_rows: int = Field(1000, gt=0, le=SIM_MAX_BATCH_ROWS)
+    sensors: int = Field(50, gt=0, le=100000)
+    pipeline: str | None = "sensores"
+
+
+class Throttle(BaseModel):
+    rate: float = Field(..., gt=0, le=SIM_MAX_RATE)
+
+
+def make_batch(rows: int, sensors: int, start: float, rng) -> bytes:
+    """
+    Genera un lote con las mismas columnas que generator/generator.py.
+    """
+    # pandas se importa al generar el primer lote: importarlo con el módulo
+    # agregaba ~0.15 s al arranque de la API aunque no se simule nada
+    import pandas as pd
+
+    base = np.datetime64(int(start), "s")
+    df = pd.DataFrame({
+        "sensorId": np.char.add("S", rng.integers(0, sensors, rows).astype(str)),
+        "timestamp": (base + np.arange(rows).astype("timedelta64[ms]")).astype(str),
+        "temperature": rng.normal(20, 8, rows).round(2),
+        "humidity": rng.uniform(0, 100, rows).round(1),
+        "pressure": rng.normal(1013, 5, rows).round(1),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.fromiter(samples, dtype=float), [50, 95, 99])
+    return {"count": len(samples), "p50": round(p50, 4), "p95": round(p95, 4), "p99": round(p99, 4)}
+
+
+class Simulator:
+    def __init__(self):
+        self.config = None
+        self._task = None
+        self._pending = {}
+        self._reset()
+
+    def _reset(self):
+        self.started_at = None
+        self.batches_sent = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.last_error = None
+        self.tasks_ok = 0
+        self.tasks_failed = 0
+        self.tasks_lost = 0
+        self.rows_sent = 0
+        self.rows_loaded = 0
+        self._pending.clear()
+        self._accept = deque(maxlen=SIM_WINDOW)
+        self._persist = deque(maxlen=SIM_WINDOW)
+        self._finish = deque(maxlen=SIM_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, config: SimulationConfig):
+        self._reset()
+        self.config = config
+        self.started_at = time.monotonic()
+        # una simulación anterior que terminó sola (sin stop) dejó su listener
+        realtime.hub.remove_listener(self.on_event)
+        realtime.hub.add_listener(self.on_event)
+        self._task = asyncio.create_task(self._run())
+
+    def throttle(self, rate: float):
+        self.config = self.config.model_copy(update={"rate": rate})
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # el lazo ya había terminado con error: se informa en las estadísticas
+            self.errors += 1
+            self.last_error = str(e)
+        finally:
+            realtime.hub.remove_listener(self.on_event)
+
+    async def _run(self):
+        rng = np.random.default_rng()
+        next_at = time.monotonic()
+        while True:
+            config = self.config
+            await self._send_batch(config, rng)
+            self._expire()
+            # ritmo fijo: si un envío se atrasa no se acumulan ráfagas
+            next_at = max(next_at + 1 / config.rate, time.monotonic())
+            await asyncio.sleep(next_at - time.monotonic())
+
+    async def _send_batch(self, config: SimulationConfig, rng):
+        t0 = time.monotonic()
+        task_kwargs = {"pipeline": config.pipeline} if config.pipeline else None
+        filename = f"sim_{self.batches_sent:08d}.csv"
+        try:
+            # ~1.6 s por millón de filas: en un hilo, para no frenar el event loop
+            # (los lotes van de a uno, así que el rng nunca se usa desde dos hilos)
+            payload = await asyncio.to_thread(make_batch, config.batch_rows, config.sensors,
+                                              time.time(), rng)
+
+            async def blocks():
+                yield payload
+
+            result = await ingest(blocks(), filename, task_kwargs)
+        except Exception as e:
+            # el error queda en last_error de /simulate/stats
+            self.errors += 1
+            self.last_error = str(e)
+            return
+
+        accepted = time.monotonic()
+        self.batches_sent += 1
+        self.rows_sent += config.batch_rows
+        self._accept.append(accepted - t0)
+        if result.get("duplicate"):
+            self.duplicates += 1
+            return
+        self._pending[result["task_id"]] = {"accepted": accepted, "persisted": None}
+
+    def _expire(self):
+        limit = time.monotonic() - SIM_TASK_TIMEOUT
+        for task_id in [t for t, p in self._pending.items() if p["accepted"] < limit]:
+            del self._pending[task_id]
+            self.tasks_lost += 1
+
+    def on_event(self, topic: str, message: dict):
+        """
+        Listener del hub: recibe los eventos task:<id> del worker.
+        """
+        if not topic.startswith("task:"):
+            return
+        pending = self._pending.get(topic[5:])
+        if pending is None:
+            return
+        now = time.monotonic()
+        data = message.get("data") or {}
+
+        if message.get("type") == "progress":
+            if pending["persisted"] is None and data.get("rows_loaded"):
+                pending["persisted"] = now
+                self._persist.append(now - pending["accepted"])
+        elif message.get("type") == "done":
+            del self._pending[topic[5:]]
+            if data.get("status") != "ok":
+                self.tasks_failed += 1
+                return
+            self.tasks_ok += 1
+            self.rows_loaded += data.get("rows_loaded", 0)
+            self._finish.append(now - pending["accepted"])
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            "running": self.running,
+            "config": self.config.model_dump() if self.config else None,
+            "elapsed_s": round(elapsed, 2),
+            "batches_sent": self.batches_sent,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "tasks_ok": self.tasks_ok,
+            "tasks_failed": self.tasks_failed,
+            "tasks_lost": self.tasks_lost,
+            "in_flight": len(self._pending),
+            "throughput": {
+                "files_per_s": round(self.tasks_ok / elapsed, 3) if elapsed else 0,
+                "rows_sent_per_s": round(self.rows_sent / elapsed, 1) if elapsed else 0,
+                "rows_loaded_per_s": round(self.rows_loaded / elapsed, 1) if elapsed else 0,
+            },
+            # segundos; "accepted" es generar + ingerir el lote, los otros se
+            # cuentan desde que la API lo aceptó
+            "latency_s": {
+                "accepted": percentiles(self._accept),
+                "persisted": percentiles(self._persist),
+                "finished": percentiles(self._finish),
+            },
+        }
+
+
+simulator = Simulator()
+
+
+@router.post("/start")
+async def start_simulation(config: SimulationConfig):
+    if simulator.running:
+        raise HTTPException(status_code=409, detail="La simulación ya está corriendo")
+    simulator.start(config)
+    return simulator.stats()
+
+
+@router.post("/throttle")
+async def throttle_simulation(body: Throttle):
+    if not simulator.running:
+        raise HTTPException(status_code=409, detail="No hay una simulación corriendo")
+    simulator.throttle(body.rate)
+    return simulator.stats()
+
+
+@router.post("/stop")
+async def stop_simulation():
+    if not simulator.running:
+        raise HTTPException(status_code=409, detail="No hay una simulación corriendo")
+    await simulator.stop()
+    return simulator.stats()
+
+
+@router.get("/stats")
+async def simulation_stats():
+    return simulator.stats()
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from db import mongo_collection
-from auth.security import create_access_token, verify_password, hash_password
+import response_cache
+from db import get_users_collection
+from auth.security import create_access_token, verify_password_async, hash_password_async
+from auth.dependencies import get_current_user, invalidate_user
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -40,20 +44,20 @@ class UserInDB(UserBase):
         }
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Autentica un usuario y devuelve un token JWT.
     FastAPI espera un form-data con 'username' y 'password'.
     El frontend puede enviar el email en el campo 'username'.
     """
     # Buscar usuario por email (que viene en el campo 'username' del form)
-    user = mongo_collection.find_one({"email": form_data.username})
+    user = await get_users_collection().find_one({"email": form_data.username})
 
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     # Verificar la contraseña
-    if not verify_password(form_data.password, user["password_hash"]):
+    if not await verify_password_async(form_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Contraseña incorrecta")
 
     # Crear el token JWT
@@ -64,51 +68,57 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     
     return {"access_token": access_token, "token_type": "bearer", "user_info": user_info}
 
-# Esquema de seguridad para obtener el token de la cabecera
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
-
 @router.get("", response_model=List[UserInDB])
-def read_users(token: str = Depends(oauth2_scheme)):
+async def read_users(request: Request, current_user: dict = Depends(get_current_user)):
     """
     Obtiene una lista de todos los usuarios del sistema.
     Ruta protegida que requiere autenticación.
+    La lista sale de la caché de respuestas (con ETag) hasta que se crea,
+    edita o borra un usuario.
     """
-    # La dependencia oauth2_scheme ya valida que el token exista.
-    # Aquí podrías añadir una validación más profunda del token si quisieras.
-    
+    # get_current_user ya verificó el token y que el usuario exista.
+    return await response_cache.cached_json_async(request, "users", list_users)
+
+async def list_users() -> List[UserInDB]:
     users = []
-    for user in mongo_collection.find():
+    async for user in get_users_collection().find():
         # Asegurarse de que el _id se pueda serializar
         user['_id'] = str(user['_id'])
         users.append(UserInDB(**user))
     return users
 
 @router.post("", response_model=UserInDB)
-def create_user(user: UserCreate, token: str = Depends(oauth2_scheme)):
+async def create_user(user: UserCreate, current_user: dict = Depends(get_current_user)):
     """
     Crea un nuevo usuario en el sistema.
     """
     # Verificar si el username o email ya existen
-    if mongo_collection.find_one({"username": user.username}):
+    if await get_users_collection().find_one({"username": user.username}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="El nombre de usuario ya está en uso.")
-    if mongo_collection.find_one({"email": user.email}):
+    if await get_users_collection().find_one({"email": user.email}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="El correo electrónico ya está en uso.")
 
-    hashed_pass = hash_password(user.password)
+    hashed_pass = await hash_password_async(user.password)
     user_doc = user.model_dump()
     del user_doc["password"]
     user_doc["password_hash"] = hashed_pass
 
-    result = mongo_collection.insert_one(user_doc)
-    created_user = mongo_collection.find_one({"_id": result.inserted_id})
-    
+    try:
+        result = await get_users_collection().insert_one(user_doc)
+    except DuplicateKeyError:
+        # otra alta con el mismo username/email ganó entre la verificación y el insert
+        raise HTTPException(status_code=400, detail="El nombre de usuario o correo ya está en uso.")
+
+    # insert_one agrega el _id al mismo dict; no hace falta volver a leerlo
+    created_user = user_doc
     # Convertir el ObjectId a string antes de pasarlo al modelo Pydantic
-    created_user['_id'] = str(created_user['_id'])
+    created_user['_id'] = str(result.inserted_id)
+    response_cache.invalidate("users")
 
     return UserInDB(**created_user)
 
 @router.put("/{user_id}", response_model=UserInDB)
-def update_user(user_id: str, user_update: UserUpdate, token: str = Depends(oauth2_scheme)):
+async def update_user(user_id: str, user_update: UserUpdate, current_user: dict = Depends(get_current_user)):
     """
     Actualiza la información de un usuario.
     """
@@ -119,19 +129,24 @@ def update_user(user_id: str, user_update: UserUpdate, token: str = Depends(oaut
 
     # Si se proporciona una nueva contraseña, hashearla
     if "password" in update_data and update_data["password"]:
-        update_data["password_hash"] = hash_password(update_data["password"])
+        update_data["password_hash"] = await hash_password_async(update_data["password"])
         del update_data["password"]
     elif "password" in update_data:
         del update_data["password"] # No actualizar si está vacía
 
-    updated_user = mongo_collection.find_one_and_update(
-        {"_id": ObjectId(user_id)},
-        {"$set": update_data},
-        return_document=True
-    )
+    try:
+        updated_user = await get_users_collection().find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="El correo electrónico ya está en uso.")
 
     if not updated_user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado.")
+    invalidate_user(updated_user["username"])
+    response_cache.invalidate("users")
 
     # Convertir el ObjectId a string antes de pasarlo al modelo Pydantic
     updated_user['_id'] = str(updated_user['_id'])
@@ -139,16 +154,21 @@ def update_user(user_id: str, user_update: UserUpdate, token: str = Depends(oaut
     return UserInDB(**updated_user)
 
 @router.delete("/{user_id}", status_code=204)
-def delete_user(user_id: str, token: str = Depends(oauth2_scheme)):
+async def delete_user(user_id: str, current_user: dict = Depends(get_current_user)):
     """
     Elimina un usuario del sistema.
     """
     if not ObjectId.is_valid(user_id):
         raise HTTPException(status_code=400, detail="ID de usuario inválido.")
 
-    delete_result = mongo_collection.delete_one({"_id": ObjectId(user_id)})
+    deleted_user = await get_users_collection().find_one_and_delete(
+        {"_id": ObjectId(user_id)}, projection={"username": 1}
+    )
 
-    if delete_result.deleted_count == 0:
+    if deleted_user is None:
         raise HTTPException(status_code=404, detail="Usuario no encontrado.")
+    # sus tokens dejan de servir: get_current_user ya no lo encuentra
+    invalidate_user(deleted_user["username"])
+    response_cache.invalidate("users")
     
     return None
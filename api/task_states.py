@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from mysql.connector import Error
+
+from db import get_mysql_conn
+
+# Estado de las tareas en MySQL.task_states (lo actualiza el worker en cada etapa).
+# Reemplaza las consultas al backend rpc:// de Celery: leer un estado es
+# una búsqueda por clave primaria.
+
+# Equivalencia con los estados de Celery que devolvía /task-status antes
+CELERY_STATES = {
+    "queued": "PENDING",
+    "reading": "STARTED",
+    "transforming": "STARTED",
+    "loading": "STARTED",
+    "split": "STARTED",
+    "retrying": "RETRY",
+    "done": "SUCCESS",
+    "duplicate": "SUCCESS",
+    "error": "FAILURE",
+}
+
+_task_states_ready = False
+
+
+def _ensure_task_states(cursor):
+    """
+    Crea la tabla de estados (una sola vez por proceso).
+    """
+    global _task_states_ready
+    if _task_states_ready:
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS task_states (
+            task_id VARCHAR(64) PRIMARY KEY,
+            stage VARCHAR(20),
+            filename VARCHAR(255),
+            rows_in BIGINT,
+            rows_loaded BIGINT,
+            detail TEXT,
+            output_file VARCHAR(1024),
+            created_at DATETIME,
+            updated_at DATETIME,
+            INDEX idx_task_states_updated_at (updated_at)
+        )
+    """)
+    _task_states_ready = True
+
+
+def mark_queued(task_id: str, filename: str):
+    """
+    Registra la tarea como "queued" antes de mandarla al broker, así el
+    estado existe aunque el worker todavía no la haya tomado.
+    """
+    conn = get_mysql_conn()
+    if conn is None:
+        return
+    now = datetime.now()
+    try:
+        cursor = conn.cursor()
+        _ensure_task_states(cursor)
+        cursor.execute(
+            "INSERT IGNORE INTO task_states (task_id, stage, filename, rows_in, rows_loaded, "
+            "created_at, updated_at) VALUES (%s, 'queued', %s, 0, 0, %s, %s)",
+            (task_id, filename, now, now)
+        )
+        conn.commit()
+    except Error as e:
+        print("Error guardando estado de la tarea:", e)
+    finally:
+        conn.close()
+
+
+def mark_error(task_id: str, detail: str):
+    """
+    Marca como "error" una tarea que quedó en "queued" pero no llegó al broker.
+    """
+    conn = get_mysql_conn()
+    if conn is None:
+        return
+    try:
+        cursor = conn.cursor()
+        _ensure_task_states(cursor)
+        cursor.execute(
+            "UPDATE task_states SET stage = 'error', detail = %s, updated_at = %s "
+            "WHERE task_id = %s",
+            (detail, datetime.now(), task_id)
+        )
+        conn.commit()
+    except Error as e:
+        print("Error guardando estado de la tarea:", e)
+    finally:
+        conn.close()
+
+
+def get_states(task_ids: list) -> dict:
+    """
+    Estados de varias tareas en una sola consulta por clave primaria.
+    Devuelve {task_id: fila}; las tareas desconocidas no aparecen.
+    """
+    if not task_ids:
+        return {}
+    conn = get_mysql_conn()
+    if conn is None:
+        raise Error("No se pudo conectar a MySQL")
+    try:
+        cursor = conn.cursor(dictionary=True)
+        _ensure_task_states(cursor)
+        placeholders = ", ".join(["%s"] * len(task_ids))
+        cursor.execute(
+            "SELECT task_id, stage, filename, rows_in, rows_loaded, detail, output_file, "
+            f"created_at, updated_at FROM task_states WHERE task_id IN ({placeholders})",
+            tuple(task_ids)
+        )
+        return {row["task_id"]: row for row in cursor.fetchall()}
+    finally:
+        conn.close()
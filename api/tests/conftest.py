@@ -0,0 +1,5 @@
+import os
+import sys
+
+# la API corre desde api/ con imports planos (from db import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
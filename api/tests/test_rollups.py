@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from routes.rollups import DEFAULT_MAX_POINTS, pick_resolution
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.mark.parametrize("span, expected", [
+    (timedelta(days=1), "hour"),
+    (timedelta(days=30), "hour"),
+    (timedelta(days=365), "day"),
+])
+def test_pick_resolution_finest_within_max_points(span, expected):
+    assert pick_resolution(START, START + span, DEFAULT_MAX_POINTS) == expected
+
+
+def test_pick_resolution_minute_when_it_fits():
+    assert pick_resolution(START, START + timedelta(hours=6), DEFAULT_MAX_POINTS) == "minute"
+
+
+def test_pick_resolution_falls_back_to_day():
+    assert pick_resolution(START, START + timedelta(days=365 * 10), DEFAULT_MAX_POINTS) == "day"
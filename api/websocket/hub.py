@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+# Hub de WebSocket con suscripción por tópico (equivalente a los grupos de SignalR).
+# Tópicos: task:<task_id> (avance y fin de una tarea) y sensor:<sensorId> (registros).
+#
+# Cada cliente tiene su propia cola acotada y una tarea que le envía los
+# mensajes en lotes. publish() nunca espera a ningún cliente: si la cola de
+# un navegador lento se llena se descartan sus mensajes más viejos, y si no
+# acepta un envío en WS_SEND_TIMEOUT segundos se lo desconecta.
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+WS_MAX_BATCH = int(os.getenv("WS_MAX_BATCH", "500"))
+WS_FLUSH_INTERVAL = float(os.getenv("WS_FLUSH_INTERVAL", "0.05"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+# Tipos de mensaje donde solo importa el último por tópico
+COALESCE_TYPES = {"progress"}
+
+router = APIRouter(tags=["realtime"])
+
+
+class Client:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.topics = set()
+        self.dropped = 0
+        self.sender = None
+
+    def offer(self, message: dict):
+        """
+        Encola sin bloquear; si la cola está llena descarta el mensaje más viejo.
+        """
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+
+
+def coalesce(messages: list) -> list:
+    """
+    Junta los mensajes de un lote: de los tipos en COALESCE_TYPES queda solo
+    el último por tópico (en la posición del último); el resto se mantiene en orden.
+    """
+    last = {}
+    for i, message in enumerate(messages):
+        if message.get("type") in COALESCE_TYPES:
+            last[(message.get("topic"), message.get("type"))] = i
+    return [
+        message for i, message in enumerate(messages)
+        if message.get("type") not in COALESCE_TYPES
+        or last[(message.get("topic"), message.get("type"))] == i
+    ]
+
+
+class Hub:
+    def __init__(self):
+        self._topics = {}
+        self._clients = set()
+        # callbacks internos de la API (p.ej. el simulador) que ven todos los eventos
+        self._listeners = []
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    async def connect(self, websocket: WebSocket) -> Client:
+        await websocket.accept()
+        client = Client(websocket)
+        client.sender = asyncio.create_task(self._send_loop(client))
+        self._clients.add(client)
+        return client
+
+    def disconnect(self, client: Client):
+        for topic in list(client.topics):
+            self.unsubscribe(client, topic)
+        self._clients.discard(client)
+        if client.sender is not None and client.sender is not asyncio.current_task():
+            client.sender.cancel()
+
+    def subscribe(self, client: Client, topic: str):
+        self._topics.setdefault(topic, set()).add(client)
+        client.topics.add(topic)
+
+    def unsubscribe(self, client: Client, topic: str):
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(client)
+            if not subscribers:
+                del self._topics[topic]
+        client.topics.discard(topic)
+
+    def publish(self, topic: str, message: dict):
+        """
+        Entrega el mensaje a los suscriptores del tópico. Debe llamarse desde
+        el event loop (el puente con RabbitMQ usa call_soon_threadsafe).
+        """
+        message = {**message, "topic": topic}
+        for client in self._topics.get(topic, ()):
+            client.offer(message)
+        for listener in self._listeners:
+            try:
+                listener(topic, message)
+            except Exception as e:
+                print("Error en listener del hub:", e)
+
+    def add_listener(self, callback):
+        """
+        Registra `callback(topic, message)` para todos los eventos publicados.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    async def _send_loop(self, client: Client):
+        try:
+            while True:
+                batch = [await client.queue.get()]
+                # esperar un poco para juntar más mensajes en el mismo envío
+                await asyncio.sleep(WS_FLUSH_INTERVAL)
+                while len(batch) < WS_MAX_BATCH and not client.queue.empty():
+                    batch.append(client.queue.get_nowait())
+
+                payload = {"messages": coalesce(batch)}
+                if client.dropped:
+                    payload["dropped"] = client.dropped
+                    client.dropped = 0
+                await asyncio.wait_for(
+                    client.websocket.send_text(json.dumps(payload, default=str)),
+                    timeout=WS_SEND_TIMEOUT,
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # cliente lento o desconectado: se lo saca del hub
+            self.disconnect(client)
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+
+
+hub = Hub()
+
+
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    El cliente manda {"action": "subscribe" | "unsubscribe", "topic": "task:<id>"}
+    y recibe lotes {"messages": [...]} con los eventos de sus tópicos.
+    """
+    client = await hub.connect(websocket)
+    try:
+        while True:
+            request = await websocket.receive_json()
+            if not isinstance(request, dict):
+                # JSON válido pero no un objeto ([], "x", 3): se ignora
+                continue
+            action = request.get("action")
+            topic = request.get("topic")
+            if not topic or not isinstance(topic, str):
+                continue
+            if action == "subscribe":
+                hub.subscribe(client, topic)
+            elif action == "unsubscribe":
+                hub.unsubscribe(client, topic)
+            client.offer({"type": action, "topic": topic})
+    except (WebSocketDisconnect, ValueError, RuntimeError):
+        pass
+    finally:
+        hub.disconnect(client)
@@ -0,0 +1,274 @@
+"""
+Generador de CSV sintéticos de sensores para pruebas de carga del pipeline
+upload -> Celery -> worker.
+
+Ejemplos:
+    # un archivo de 5 millones de filas
+    python generator.py --rows 5000000 --out sensores.csv
+
+    # ~5 GB con 2% de nulos, 1% de errores y 3% de filas repetidas, en 8 procesos
+    python generator.py --size 5GB --null-rate 0.02 --error-rate 0.01 --dup-rate 0.03 --workers 8
+
+    # streaming: 20.000 filas/seg en archivos de 100.000 filas dentro de data/inbound
+    python generator.py --stream --rate 20000 --file-rows 100000 --dir ../data/inbound
+
+Todo se arma con operaciones vectorizadas de NumPy por bloque (nada fila por fila),
+y los bloques se pueden generar en paralelo (--workers). Cada bloque usa su
+propio generador aleatorio derivado de (seed, número de bloque), así que el
+mismo seed produce el mismo archivo con cualquier cantidad de procesos.
+"""
+import argparse
+import math
+import os
+import re
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+import numpy as np
+
+# Columnas de medición disponibles: (distribución, parámetros, decimales)
+SENSOR_COLUMNS = {
+    "temperature": ("normal", (20.0, 8.0), 2),
+    "humidity": ("uniform", (0.0, 100.0), 1),
+    "pressure": ("normal", (1013.0, 5.0), 1),
+    "co2": ("normal", (450.0, 80.0), 0),
+    "pm25": ("uniform", (0.0, 150.0), 1),
+    "noise_db": ("normal", (55.0, 10.0), 1),
+}
+DEFAULT_COLUMNS = ["temperature", "humidity", "pressure"]
+
+# Valores inválidos que se inyectan con --error-rate
+ERROR_TOKENS = np.array(["ERR", "#N/A", "-9999", "overflow", "9.9e99", "??"])
+
+# Cadenas "000".."999" para armar la parte decimal sin formatear número por número
+_FRACTIONS = {d: np.array([str(i).zfill(d) for i in range(10 ** d)]) for d in (1, 2, 3)}
+
+
+def parse_size(text: str) -> int:
+    """
+    "5GB" / "500MB" / "123456" -> bytes.
+    """
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B?)\s*", text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Tamaño inválido: {text}")
+    units = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+             "G": 1024 ** 3, "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+    return int(float(match.group(1)) * units[match.group(2)])
+
+
+def format_fixed(values: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    Formatea floats con `decimals` decimales de forma vectorizada
+    (parte entera con astype(str) + tabla de fracciones).
+    """
+    if decimals == 0:
+        return np.rint(values).astype(np.int64).astype(str)
+    scale = 10 ** decimals
+    ints = np.rint(values * scale).astype(np.int64)
+    absolute = np.abs(ints)
+    text = np.char.add(np.char.add((absolute // scale).astype(str), "."),
+                       _FRACTIONS[decimals][absolute % scale])
+    return np.where(ints < 0, np.char.add("-", text), text)
+
+
+class SensorGenerator:
+    """
+    Genera bloques de filas CSV (ya como texto). Cada bloque depende solo de
+    (seed, índice del bloque, primera fila), por eso se puede generar en
+    cualquier proceso y en cualquier orden.
+    """
+
+    def __init__(self, columns=None, sensors: int = 100, seed: int = None,
+                 null_rate: float = 0.0, error_rate: float = 0.0, dup_rate: float = 0.0,
+                 bad_line_rate: float = 0.0, start: str = "2025-01-01T00:00:00",
+                 interval_ms: int = 1000):
+        self.columns = list(columns or DEFAULT_COLUMNS)
+        for column in self.columns:
+            if column not in SENSOR_COLUMNS:
+                raise ValueError(f"Columna desconocida: {column} (opciones: {', '.join(SENSOR_COLUMNS)})")
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % 2 ** 63)
+        self.sensor_ids = np.array([f"S{i:04d}" for i in range(sensors)])
+        self.null_rate = null_rate
+        self.error_rate = error_rate
+        self.dup_rate = dup_rate
+        self.bad_line_rate = bad_line_rate
+        self.start = np.datetime64(start, "ms")
+        self.interval = np.timedelta64(interval_ms, "ms")
+        # para uso secuencial (modo streaming)
+        self.next_index = 0
+        self.next_row = 0
+
+    @property
+    def header(self) -> str:
+        return ",".join(["sensorId", "timestamp", *self.columns])
+
+    def _inject(self, rng, values: np.ndarray) -> np.ndarray:
+        n = len(values)
+        if self.error_rate:
+            bad = rng.random(n) < self.error_rate
+            values = np.where(bad, ERROR_TOKENS[rng.integers(0, len(ERROR_TOKENS), n)], values)
+        if self.null_rate:
+            values = np.where(rng.random(n) < self.null_rate, "", values)
+        return values
+
+    def chunk(self, rows: int, index: int, first_row: int) -> np.ndarray:
+        """
+        Devuelve un array de `rows` líneas CSV (sin salto de línea).
+        """
+        rng = np.random.default_rng([self.seed, index])
+        # timestamps crecientes con algo de ruido
+        offsets = (first_row + np.arange(rows)) * self.interval
+        jitter = rng.integers(0, max(int(self.interval / np.timedelta64(1, "ms")), 1), rows)
+        timestamps = self.start + offsets + jitter.astype("timedelta64[ms]")
+
+        line = np.char.add(self.sensor_ids[rng.integers(0, len(self.sensor_ids), rows)], ",")
+        line = np.char.add(line, np.datetime_as_string(timestamps, unit="s"))
+        for column in self.columns:
+            dist, (a, b), decimals = SENSOR_COLUMNS[column]
+            if dist == "normal":
+                values = rng.normal(a, b, rows)
+            else:
+                values = rng.uniform(a, b, rows)
+            line = np.char.add(np.char.add(line, ","), self._inject(rng, format_fixed(values, decimals)))
+
+        if self.dup_rate:
+            # filas repetidas exactas copiadas de otras filas del bloque
+            dup = np.flatnonzero(rng.random(rows) < self.dup_rate)
+            line[dup] = line[rng.integers(0, rows, len(dup))]
+        if self.bad_line_rate:
+            # líneas con un campo de más (para probar el dead-letter)
+            bad = rng.random(rows) < self.bad_line_rate
+            line = np.where(bad, np.char.add(line, ",EXTRA"), line)
+        return line
+
+    def chunk_bytes(self, job) -> bytes:
+        """
+        `job` = (rows, index, first_row). Se usa como función de Pool.imap.
+        """
+        return ("\n".join(self.chunk(*job).tolist()) + "\n").encode("utf-8")
+
+    def next_chunk_bytes(self, rows: int) -> bytes:
+        data = self.chunk_bytes((rows, self.next_index, self.next_row))
+        self.next_index += 1
+        self.next_row += rows
+        return data
+
+
+def write_file(gen: SensorGenerator, path: str, rows: int = None, size: int = None,
+               chunk_rows: int = 500_000, workers: int = 1) -> tuple:
+    """
+    Escribe un CSV de `rows` filas o de aproximadamente `size` bytes
+    (la cantidad de filas se estima con el primer bloque).
+    Se escribe a un temporal y se renombra al final (el watcher/worker
+    nunca ve un archivo a medio escribir). Devuelve (filas, bytes).
+    """
+    tmp_path = os.path.join(os.path.dirname(path) or ".", f".{os.path.basename(path)}.part")
+    with open(tmp_path, "wb") as fh:
+        fh.write((gen.header + "\n").encode("utf-8"))
+
+        start_row = gen.next_row
+        first_rows = min(chunk_rows, rows) if rows is not None else chunk_rows
+        first = gen.next_chunk_bytes(first_rows)
+        fh.write(first)
+        if rows is None:
+            rows = max(first_rows, math.ceil(size / (len(first) / first_rows)))
+
+        end_row = start_row + rows
+        jobs = []
+        while gen.next_row < end_row:
+            n = min(chunk_rows, end_row - gen.next_row)
+            jobs.append((n, gen.next_index, gen.next_row))
+            gen.next_index += 1
+            gen.next_row += n
+
+        if workers > 1 and jobs:
+            with Pool(workers) as pool:
+                # imap mantiene el orden de los bloques
+                for data in pool.imap(gen.chunk_bytes, jobs):
+                    fh.write(data)
+        else:
+            for job in jobs:
+                fh.write(gen.chunk_bytes(job))
+        written_bytes = fh.tell()
+    os.replace(tmp_path, path)
+    return rows, written_bytes
+
+
+def stream(gen: SensorGenerator, directory: str, rate: float, file_rows: int,
+           duration: float = None, prefix: str = "sensores"):
+    """
+    Deja archivos de `file_rows` filas en `directory` a un ritmo de `rate`
+    filas/seg (promedio sostenido) hasta cortar con Ctrl+C o `duration` segundos.
+    """
+    os.makedirs(directory, exist_ok=True)
+    started = time.monotonic()
+    total = 0
+    seq = 0
+    try:
+        while duration is None or time.monotonic() - started < duration:
+            name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{seq:06d}.csv"
+            write_file(gen, os.path.join(directory, name), rows=file_rows, chunk_rows=file_rows)
+            total += file_rows
+            seq += 1
+
+            # dormir hasta que el ritmo acumulado vuelva a `rate`
+            ahead = total / rate - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+            elapsed = time.monotonic() - started
+            print(f"{name}: {total} filas en {elapsed:.1f}s ({total / elapsed:,.0f} filas/seg)")
+    except KeyboardInterrupt:
+        pass
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, help="cantidad de filas")
+    parser.add_argument("--size", type=parse_size, help="tamaño aproximado (p.ej. 500MB, 5GB)")
+    parser.add_argument("--out", default="sensores.csv", help="archivo de salida")
+    parser.add_argument("--columns", default=",".join(DEFAULT_COLUMNS),
+                        help=f"columnas de medición ({', '.join(SENSOR_COLUMNS)})")
+    parser.add_argument("--sensors", type=int, default=100, help="cantidad de sensores distintos")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--null-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--dup-rate", type=float, default=0.0)
+    parser.add_argument("--bad-line-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="procesos que generan bloques en paralelo")
+    parser.add_argument("--stream", action="store_true", help="modo streaming a --dir")
+    parser.add_argument("--dir", default=os.path.join("..", "data", "inbound"))
+    parser.add_argument("--rate", type=float, default=10_000, help="filas/seg en modo streaming")
+    parser.add_argument("--file-rows", type=int, default=50_000, help="filas por archivo en modo streaming")
+    parser.add_argument("--duration", type=float, default=None, help="segundos de streaming")
+    args = parser.parse_args()
+
+    gen = SensorGenerator(
+        columns=[c.strip() for c in args.columns.split(",") if c.strip()],
+        sensors=args.sensors,
+        seed=args.seed,
+        null_rate=args.null_rate,
+        error_rate=args.error_rate,
+        dup_rate=args.dup_rate,
+        bad_line_rate=args.bad_line_rate,
+    )
+
+    if args.stream:
+        stream(gen, args.dir, args.rate, args.file_rows, args.duration)
+        return
+
+    if args.rows is None and args.size is None:
+        parser.error("indicar --rows o --size (o --stream)")
+    t0 = time.perf_counter()
+    rows, size = write_file(gen, args.out, rows=args.rows, size=args.size,
+                            chunk_rows=args.chunk_rows, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.out}: {rows} filas, {size / 1024 ** 2:.1f} MB en {elapsed:.2f}s "
+          f"({rows / elapsed:,.0f} filas/seg, {size / 1024 ** 2 / elapsed:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
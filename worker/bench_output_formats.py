@@ -0,0 +1,103 @@
+"""
+Compara la salida processed_* en CSV contra Parquet por el mismo camino
+que procesar_csv: CSV de entrada -> reader (bloques como texto) ->
+pipeline -> outputs (con los tipos de reader.infer_column_types).
+No carga en las bases: mide solo lectura, transformación y escritura.
+
+Uso (dentro del contenedor del worker):
+    python bench_output_formats.py --rows 5000000 --chunk 100000
+    python bench_output_formats.py --pipeline sensores
+
+Mide el tiempo de punta a punta de cada formato (y cuánto de eso es
+inferir los tipos), el tamaño del archivo, el tiempo de lectura
+(pandas.read_csv vs Arrow con memory-map) y los tipos que quedaron en el Parquet.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from outputs import open_output, read_processed
+from reader import infer_column_types, iter_csv_chunks
+from transformers import build_pipeline, run_pipeline
+
+
+def make_input(rows: int, path: str):
+    """
+    CSV de entrada con las columnas de generator/generator.py.
+    """
+    rng = np.random.default_rng(7)
+    start = np.datetime64("2025-01-01T00:00:00")
+    pd.DataFrame({
+        "sensorId": np.char.add("S", rng.integers(0, 500, rows).astype(str)),
+        "timestamp": (start + np.arange(rows).astype("timedelta64[s]")).astype(str),
+        "temperature": rng.normal(20, 8, rows).round(2),
+        "humidity": rng.uniform(0, 100, rows).round(1),
+        "pressure": rng.normal(1013, 5, rows).round(1),
+    }).to_csv(path, index=False)
+
+
+def process(csv_path: str, out_path: str, fmt: str, chunk: int, pipeline) -> float:
+    """
+    Lo que hace process_file entre leer y cargar. Devuelve los segundos de inferir tipos.
+    """
+    steps = build_pipeline(pipeline)
+    ctx = {"processed_at": datetime(2025, 1, 1), "filename": os.path.basename(csv_path)}
+    t0 = time.perf_counter()
+    column_types = infer_column_types(csv_path)
+    types_s = time.perf_counter() - t0
+    with open_output(out_path, fmt, column_types=column_types) as out:
+        for df in iter_csv_chunks(csv_path, chunk):
+            out.write(run_pipeline(steps, df, ctx))
+    return types_s
+
+
+def bench(rows: int, chunk: int, workdir: str, pipeline):
+    csv_path = os.path.join(workdir, "bench_input.csv")
+    make_input(rows, csv_path)
+    print(f"entrada: {rows} filas, {os.path.getsize(csv_path) / 1024 ** 2:.1f} MB")
+
+    print(f"{'formato':<10}{'proceso (s)':>13}{'tipos (s)':>11}{'tamaño (MB)':>14}"
+          f"{'lectura (s)':>14}")
+    schema = None
+    for fmt in ("csv", "parquet"):
+        path = os.path.join(workdir, f"bench.{fmt}")
+
+        t0 = time.perf_counter()
+        types_s = process(csv_path, path, fmt, chunk, pipeline)
+        process_s = time.perf_counter() - t0
+
+        size_mb = os.path.getsize(path) / 1024 ** 2
+
+        t0 = time.perf_counter()
+        if fmt == "csv":
+            back = pd.read_csv(path)
+        else:
+            table = read_processed(path)
+            schema = table.schema
+            back = table.to_pandas()
+        read_s = time.perf_counter() - t0
+        assert len(back) <= rows
+
+        print(f"{fmt:<10}{process_s:>13.2f}{types_s:>11.2f}{size_mb:>14.1f}{read_s:>14.2f}")
+        os.remove(path)
+    os.remove(csv_path)
+
+    print("\nesquema del Parquet:")
+    for field in schema:
+        print(f"  {field.name:<15}{field.type}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--chunk", type=int, default=100_000)
+    parser.add_argument("--pipeline", default="default")
+    parser.add_argument("--dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+    bench(args.rows, args.chunk, args.dir, args.pipeline)
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark de las transformaciones de transformers.py.
+
+Uso (dentro del contenedor del worker):
+    python bench_transformers.py --rows 1000000
+
+Imprime filas/seg por transformación para detectar regresiones.
+Los datos se generan como texto, igual que los bloques que lee procesar_csv.
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from transformers import build_pipeline
+
+# Un paso por transformación del registro
+BENCH_STEPS = {
+    "coerce_types": [{"transform": "coerce_types", "columns": {
+        "timestamp": "datetime", "temperature": "float", "humidity": "float"}}],
+    "validate_range": [{"transform": "validate_range", "column": "humidity", "min": 0, "max": 100}],
+    "convert_units": [{"transform": "convert_units", "column": "temperature",
+                       "conversion": "c_to_f", "target": "temperature_f"}],
+    "dedup": [{"transform": "dedup", "subset": ["sensorId", "timestamp"]}],
+    "derive": [{"transform": "derive", "name": "heat",
+                "expr": "temperature_num * 1.8 + humidity_num / 10"}],
+    "processed_at": [{"transform": "processed_at"}],
+}
+
+
+def make_chunk(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2025-01-01T00:00:00")
+    timestamps = start + rng.integers(0, 86400 * 30, rows).astype("timedelta64[s]")
+    temperature = rng.normal(20, 8, rows).round(2)
+    humidity = rng.uniform(-5, 105, rows).round(1)
+    return pd.DataFrame({
+        "sensorId": np.char.add("S", rng.integers(0, 500, rows).astype(str)),
+        "timestamp": timestamps.astype(str),
+        "temperature": temperature.astype(str),
+        "humidity": humidity.astype(str),
+        # columnas numéricas ya convertidas para medir `derive` aislado
+        "temperature_num": temperature,
+        "humidity_num": humidity,
+    })
+
+
+def bench(rows: int, repeat: int):
+    base = make_chunk(rows)
+    print(f"{'transformación':<16}{'mejor (s)':>12}{'filas/seg':>16}")
+    for name, spec in BENCH_STEPS.items():
+        _, fn, params = build_pipeline(spec)[0]
+        best = float("inf")
+        for _ in range(repeat):
+            df = base.copy()
+            ctx = {"processed_at": datetime.now(), "filename": "bench.csv"}
+            t0 = time.perf_counter()
+            fn(df, ctx, **params)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:<16}{best:>12.4f}{rows / best:>16,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    bench(args.rows, args.repeat)
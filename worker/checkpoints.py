@@ -0,0 +1,192 @@
+import os
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+import db
+
+# Checkpoint por bloque de las tareas largas (MySQL.task_checkpoints).
+# Después de cada bloque escrito y cargado se guardan los contadores de
+# filas y hasta qué byte llegaron la salida y el dead-letter. Si la tarea se
+# reintenta (o, en los shards, el worker se cae y el mensaje vuelve a la
+# cola) sigue desde el último bloque confirmado en vez de empezar de cero.
+# La clave es el task_id (procesar_csv) o "<job_id>:<shard>" (procesar_shard).
+#
+# Antes de tocar sus archivos cada ejecución toma un lease sobre la clave
+# (MySQL.task_leases): si el mismo mensaje se entrega dos veces (el broker lo
+# reentrega mientras la primera corrida sigue viva) solo una escribe la
+# salida y el checkpoint. El lease se renueva en cada bloque; si su dueño
+# muere, vence a los TASK_LEASE_SECONDS y otra entrega lo puede tomar.
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "900"))
+
+FIELDS = ("csv_size", "processed_at", "rows_in", "rows_ok", "rows_loaded", "rows_rejected",
+          "bad_lines", "output_bytes", "deadletter_bytes")
+
+
+def shard_key(job_id: str, index: int) -> str:
+    return f"{job_id}:{index}"
+
+
+class LeaseLost(Exception):
+    """
+    Otra ejecución de la misma tarea tomó el lease: esta deja de escribir.
+    """
+
+
+def acquire(checkpoint_id: str, owner: str) -> bool:
+    """
+    Toma el lease de `checkpoint_id` para `owner` (un id por ejecución).
+    Devuelve False si otra ejecución lo tiene y todavía no venció.
+    """
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=TASK_LEASE_SECONDS)
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute(
+            "INSERT IGNORE INTO task_leases (lease_id, owner, expires_at) VALUES (%s, %s, %s)",
+            (checkpoint_id, owner, expires_at)
+        )
+        if cursor.rowcount == 1:
+            conn.commit()
+            return True
+        cursor.execute(
+            "SELECT owner, expires_at FROM task_leases WHERE lease_id = %s FOR UPDATE",
+            (checkpoint_id,)
+        )
+        row = cursor.fetchone()
+        if row is not None and row[0] != owner and row[1] > now:
+            conn.commit()
+            return False
+        cursor.execute(
+            "REPLACE INTO task_leases (lease_id, owner, expires_at) VALUES (%s, %s, %s)",
+            (checkpoint_id, owner, expires_at)
+        )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _renew(cursor, checkpoint_id: str, owner: str):
+    """
+    Verifica dentro de la transacción que el lease sigue siendo de `owner`
+    y lo extiende; si no, LeaseLost.
+    """
+    cursor.execute(
+        "SELECT owner FROM task_leases WHERE lease_id = %s FOR UPDATE", (checkpoint_id,)
+    )
+    row = cursor.fetchone()
+    if row is None or row[0] != owner:
+        raise LeaseLost(checkpoint_id)
+    cursor.execute(
+        "UPDATE task_leases SET expires_at = %s WHERE lease_id = %s",
+        (datetime.now() + timedelta(seconds=TASK_LEASE_SECONDS), checkpoint_id)
+    )
+
+
+def renew(checkpoint_id: str, owner: str):
+    """
+    Renueva el lease sin guardar checkpoint (salidas Parquet, que no se retoman).
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        _renew(cursor, checkpoint_id, owner)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def release(checkpoint_id: str, owner: str):
+    """
+    Suelta el lease al terminar la ejecución (bien, con error o para
+    reintentar). Solo si sigue siendo de `owner`.
+    """
+    try:
+        conn = db.get_mysql_conn()
+    except Error as e:
+        print("Error conectando a MySQL desde worker:", e)
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM task_leases WHERE lease_id = %s AND owner = %s", (checkpoint_id, owner)
+        )
+        conn.commit()
+    except Error as e:
+        # el lease vence solo
+        print("Error soltando el lease:", e)
+    finally:
+        conn.close()
+
+
+def load(checkpoint_id: str):
+    """
+    Devuelve el checkpoint como dict (None si la tarea empieza de cero).
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT {', '.join(FIELDS)} FROM task_checkpoints WHERE checkpoint_id = %s",
+            (checkpoint_id,)
+        )
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def save(checkpoint_id: str, checkpoint: dict, owner: str = None):
+    """
+    Guarda el avance confirmado. Un error acá hace fallar el bloque
+    (y la tarea se reintenta): no se sigue sin poder retomar.
+    Con `owner` se verifica y renueva el lease en la misma transacción
+    (LeaseLost si ya no es de esta ejecución).
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        if owner is not None:
+            _renew(cursor, checkpoint_id, owner)
+        values = [checkpoint[field] for field in FIELDS]
+        cursor.execute(
+            f"REPLACE INTO task_checkpoints (checkpoint_id, {', '.join(FIELDS)}, updated_at) "
+            f"VALUES (%s, {', '.join(['%s'] * len(FIELDS))}, %s)",
+            (checkpoint_id, *values, datetime.now())
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def clear(checkpoint_id: str):
+    """
+    Borra el checkpoint de una tarea terminada (bien o con error definitivo).
+    Si falla solo queda una fila huérfana: el task_id no se vuelve a usar.
+    """
+    try:
+        conn = db.get_mysql_conn()
+    except Error as e:
+        print("Error conectando a MySQL desde worker:", e)
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM task_checkpoints WHERE checkpoint_id = %s", (checkpoint_id,))
+        conn.commit()
+    except Error as e:
+        print("Error borrando checkpoint:", e)
+    finally:
+        conn.close()
@@ -0,0 +1,330 @@
+import os
+
+import mysql.connector
+from mysql.connector import Error, errors, pooling
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
+
+# --- Configuración (mismos valores que docker-compose por defecto) ---
+MYSQL_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "mysql"),
+    "port": int(os.getenv("MYSQL_PORT", "3306")),
+    "user": os.getenv("MYSQL_USER", "root"),
+    "password": os.getenv("MYSQL_PASSWORD", "root123"),
+    "database": os.getenv("MYSQL_DATABASE", "etl_system"),
+}
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "4"))
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+MONGO_DB = os.getenv("MONGO_DB", "etl_system")
+
+# Errores de MySQL que se resuelven reintentando: sin conexión, servidor
+# caído o reiniciándose, demasiadas conexiones, deadlock y lock wait timeout.
+# El código de error es más confiable que la clase (según la versión del
+# conector, "Can't connect" llega como InterfaceError o DatabaseError).
+MYSQL_TRANSIENT_ERRNOS = {1040, 1205, 1213, 2002, 2003, 2006, 2013, 2055}
+
+# Un pool y un cliente por proceso del worker.
+# Se crean en worker_process_init (después del fork), nunca al importar.
+_mysql_pool = None
+_mongo_client = None
+
+# El esquema se crea en worker_init, pero si MySQL o Mongo todavía no
+# aceptaban conexiones (volumen nuevo, el worker arranca antes que mysql:8)
+# se vuelve a intentar al pedir la primera conexión de cada proceso, hasta
+# que salga bien. Si sale bien en worker_init los hijos lo heredan del fork.
+_mysql_schema_ready = False
+_mongo_indexes_ready = False
+
+
+def init_process():
+    """
+    Crea el pool de MySQL y el cliente de Mongo de este proceso.
+    Celery la llama desde worker_process_init.
+    """
+    global _mysql_pool, _mongo_client
+    if _mongo_client is None:
+        # MongoClient no abre conexiones hasta la primera operación
+        _mongo_client = MongoClient(MONGO_URI)
+    if _mysql_pool is None:
+        _mysql_pool = pooling.MySQLConnectionPool(
+            pool_name=f"etl_worker_{os.getpid()}",
+            pool_size=MYSQL_POOL_SIZE,
+            pool_reset_session=False,
+            **MYSQL_CONFIG
+        )
+
+
+def close_process():
+    """
+    Libera el cliente de Mongo al apagar el proceso.
+    Las conexiones del pool de MySQL se cierran con el proceso.
+    """
+    global _mysql_pool, _mongo_client
+    if _mongo_client is not None:
+        _mongo_client.close()
+    _mysql_pool = None
+    _mongo_client = None
+
+
+def get_mysql_conn():
+    """
+    Devuelve una conexión del pool. `conn.close()` la devuelve al pool.
+    Si el proceso no pasó por worker_process_init (p.ej. --pool=solo)
+    el pool se crea la primera vez que se pide.
+    """
+    if not _mysql_schema_ready:
+        bootstrap_mysql()
+    if _mysql_pool is None:
+        init_process()
+    return _mysql_pool.get_connection()
+
+
+def get_mongo_db():
+    """
+    Devuelve la base de Mongo del ETL usando el cliente compartido.
+    """
+    if _mongo_client is None:
+        init_process()
+    if not _mongo_indexes_ready:
+        create_mongo_indexes(_mongo_client[MONGO_DB])
+    return _mongo_client[MONGO_DB]
+
+
+def is_transient(exc: Exception) -> bool:
+    """
+    True si el error de MySQL o Mongo es pasajero y vale la pena reintentar.
+    """
+    if isinstance(exc, (errors.PoolError, ConnectionFailure)):
+        return True
+    return isinstance(exc, Error) and exc.errno in MYSQL_TRANSIENT_ERRNOS
+
+
+def bootstrap_schema():
+    """
+    Crea tablas e índices que necesita el worker.
+    Se ejecuta al arrancar el worker (worker_init), no en cada tarea;
+    si falla, get_mysql_conn / get_mongo_db lo reintentan.
+    """
+    bootstrap_mysql()
+    client = MongoClient(MONGO_URI)
+    try:
+        create_mongo_indexes(client[MONGO_DB])
+    finally:
+        client.close()
+
+
+def bootstrap_mysql():
+    """
+    Tablas e índices de MySQL. Los errores se propagan (el flag queda en
+    False y se reintenta en la próxima conexión).
+    """
+    global _mysql_schema_ready
+    conn = mysql.connector.connect(**MYSQL_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS upload_logs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                filename VARCHAR(255),
+                rows_in INT,
+                processed_at DATETIME
+            )
+        """)
+        # filas que pasaron el pipeline y filas que fueron al dead-letter
+        _add_column_if_missing(cursor, "upload_logs", "rows_ok", "INT AFTER rows_in")
+        _add_column_if_missing(cursor, "upload_logs", "rows_rejected", "INT AFTER rows_ok")
+        # consultas de /api/mysql/ping: por archivo y por rango de fechas
+        _add_index_if_missing(cursor, "upload_logs", "idx_upload_logs_filename", "(filename, id)")
+        _add_index_if_missing(cursor, "upload_logs", "idx_upload_logs_processed_at", "(processed_at)")
+        # registros procesados (etapa Load); las columnas del CSV van en `data`
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS processed_records (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                unique_id CHAR(32),
+                filename VARCHAR(255),
+                data JSON,
+                loaded_at DATETIME,
+                load_id CHAR(32),
+                INDEX idx_processed_records_filename (filename)
+            )
+        """)
+        _add_column_if_missing(cursor, "processed_records", "unique_id", "CHAR(32) AFTER id")
+        # transacción de carga que insertó la fila (rollups.py solo agrega las filas nuevas)
+        _add_column_if_missing(cursor, "processed_records", "load_id", "CHAR(32)")
+        _add_index_if_missing(cursor, "processed_records", "uq_processed_records_unique_id",
+                              "(unique_id)", unique=True)
+        # archivos recibidos por hash de contenido (idempotencia de /api/upload)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                content_hash CHAR(64) PRIMARY KEY,
+                saved_as VARCHAR(255),
+                task_id VARCHAR(64),
+                status VARCHAR(20),
+                created_at DATETIME,
+                updated_at DATETIME
+            )
+        """)
+        # el watcher de /data/inbound busca por nombre los archivos que subió la API
+        _add_index_if_missing(cursor, "ingested_files", "idx_ingested_files_saved_as", "(saved_as)")
+        # archivos grandes procesados en paralelo: un trabajo y sus shards
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS csv_jobs (
+                job_id VARCHAR(64) PRIMARY KEY,
+                csv_path VARCHAR(1024),
+                out_path VARCHAR(1024),
+                content_hash CHAR(64),
+                processed_at DATETIME,
+                shards_total INT,
+                shards_done INT,
+                rows_in BIGINT,
+                rows_loaded BIGINT,
+                rows_ok BIGINT DEFAULT 0,
+                rows_rejected BIGINT DEFAULT 0,
+                status VARCHAR(20),
+                created_at DATETIME,
+                updated_at DATETIME
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS csv_shards (
+                job_id VARCHAR(64),
+                shard_index INT,
+                byte_start BIGINT,
+                byte_end BIGINT,
+                rows_in BIGINT,
+                rows_loaded BIGINT,
+                rows_ok BIGINT DEFAULT 0,
+                rows_rejected BIGINT DEFAULT 0,
+                status VARCHAR(20),
+                updated_at DATETIME,
+                PRIMARY KEY (job_id, shard_index)
+            )
+        """)
+        for table in ("csv_jobs", "csv_shards"):
+            _add_column_if_missing(cursor, table, "rows_ok", "BIGINT DEFAULT 0")
+            _add_column_if_missing(cursor, table, "rows_rejected", "BIGINT DEFAULT 0")
+        # estado de cada tarea (/api/task-status); la API escribe "queued"
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_states (
+                task_id VARCHAR(64) PRIMARY KEY,
+                stage VARCHAR(20),
+                filename VARCHAR(255),
+                rows_in BIGINT,
+                rows_loaded BIGINT,
+                detail TEXT,
+                output_file VARCHAR(1024),
+                created_at DATETIME,
+                updated_at DATETIME,
+                INDEX idx_task_states_updated_at (updated_at)
+            )
+        """)
+        # agregados por sensor para el dashboard (ver rollups.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sensor_rollups (
+                resolution VARCHAR(8),
+                sensor_id VARCHAR(64),
+                metric VARCHAR(64),
+                bucket_start DATETIME,
+                count BIGINT,
+                min_value DOUBLE,
+                max_value DOUBLE,
+                sum_value DOUBLE,
+                PRIMARY KEY (resolution, sensor_id, metric, bucket_start)
+            )
+        """)
+        # índice de archivos archivados o podados (ver retention.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archived_files (
+                original_path VARCHAR(512) PRIMARY KEY,
+                kind VARCHAR(16),
+                archive_path VARCHAR(1024),
+                compression VARCHAR(8),
+                original_bytes BIGINT,
+                archived_bytes BIGINT,
+                modified_at DATETIME,
+                archived_at DATETIME,
+                pruned_at DATETIME NULL,
+                INDEX idx_archived_files_archived_at (pruned_at, archived_at)
+            )
+        """)
+        # checkpoint por bloque de las tareas en curso (ver checkpoints.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_checkpoints (
+                checkpoint_id VARCHAR(80) PRIMARY KEY,
+                csv_size BIGINT,
+                processed_at DATETIME(6),
+                rows_in BIGINT,
+                rows_ok BIGINT,
+                rows_loaded BIGINT,
+                rows_rejected BIGINT,
+                bad_lines BIGINT,
+                output_bytes BIGINT,
+                deadletter_bytes BIGINT,
+                updated_at DATETIME
+            )
+        """)
+        # quién está ejecutando cada checkpoint_id (ver checkpoints.acquire)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_leases (
+                lease_id VARCHAR(80) PRIMARY KEY,
+                owner CHAR(32),
+                expires_at DATETIME
+            )
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+    _mysql_schema_ready = True
+
+
+def create_mongo_indexes(mongo_db):
+    """
+    Índices de Mongo (create_index no hace nada si ya existen).
+    """
+    global _mongo_indexes_ready
+    records = mongo_db["records"]
+    records.create_index("filename")
+    records.create_index("uniqueId", unique=True)
+    uploads = mongo_db["uploads"]
+    uploads.create_index([("filename", 1), ("_id", -1)])
+    uploads.create_index([("logged_at", -1), ("_id", -1)])
+    # uploads anteriores guardaban logged_at como texto ISO (hora del contenedor,
+    # UTC): se pasan a fecha para que el filtro por rango los compare bien
+    uploads.update_many(
+        {"logged_at": {"$type": "string"}},
+        [{"$set": {"logged_at": {"$dateFromString": {"dateString": "$logged_at",
+                                                      "onError": "$logged_at"}}}}],
+    )
+    mongo_db["sensor_rollups"].create_index(
+        [("resolution", 1), ("sensorId", 1), ("metric", 1), ("bucket", 1)], unique=True
+    )
+    _mongo_indexes_ready = True
+
+
+def _add_column_if_missing(cursor, table: str, column: str, definition: str):
+    """
+    ALTER TABLE ... ADD COLUMN solo si la columna no existe
+    (para bases creadas con una versión anterior del esquema).
+    """
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _add_index_if_missing(cursor, table: str, index: str, columns: str, unique: bool = False):
+    """
+    ALTER TABLE ... ADD INDEX solo si el índice no existe.
+    """
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index)
+    )
+    if cursor.fetchone()[0] == 0:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"ALTER TABLE {table} ADD {kind} {index} {columns}")
@@ -0,0 +1,85 @@
+import os
+
+import pandas as pd
+
+# Filas rechazadas de un archivo (líneas mal formadas y filas que no pasan
+# la validación), en /data/deadletter/<archivo>.rejected.ndjson.
+# Cada línea es un JSON con `_line` (número de línea en el CSV), `_reason`
+# y las columnas de la fila, o `_raw` con el texto si no se pudo leer.
+DEADLETTER_DIR = os.path.join("/data", "deadletter")
+
+os.makedirs(DEADLETTER_DIR, exist_ok=True)
+
+
+def deadletter_name(csv_name: str) -> str:
+    return f"{csv_name}.rejected.ndjson"
+
+
+class DeadLetter:
+    """
+    Se abre el archivo recién con el primer rechazo: un CSV limpio no deja
+    archivo vacío. `extra` son campos fijos que se agregan a cada línea
+    (p.ej. el shard).
+    Para retomar desde un checkpoint se pasan `offset` (bytes ya escritos)
+    y los contadores guardados; lo que quedó después de `offset` se descarta.
+    """
+
+    def __init__(self, path: str, extra: dict = None, offset: int = None, count: int = 0,
+                 bad_lines: int = 0):
+        self.path = path
+        self.extra = extra or {}
+        # filas rechazadas en total y, de ellas, líneas que el parser saltó
+        self.count = count
+        self.bad_lines = bad_lines
+        self._fh = None
+        self._size = offset or 0
+        if offset:
+            os.truncate(path, offset)
+        elif os.path.exists(path):
+            # no mezclar con el resultado de una corrida anterior del mismo archivo
+            os.remove(path)
+
+    def add_lines(self, lines: list, reasons: list, raws: list):
+        """
+        Líneas que el parser no pudo leer (se guarda el texto tal cual).
+        """
+        self._write(pd.DataFrame({"_line": lines, "_reason": reasons, "_raw": raws}))
+        self.bad_lines += len(lines)
+
+    def add_rows(self, rows: pd.DataFrame, reason: str):
+        """
+        Filas descartadas por una transformación; el índice es el número de línea.
+        """
+        if len(rows):
+            self._write(rows.assign(_line=rows.index, _reason=reason))
+
+    def _write(self, df: pd.DataFrame):
+        if self.extra:
+            df = df.assign(**self.extra)
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        text = df.to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+        # según la versión de pandas la última línea viene o no con salto
+        self._fh.write(text if text.endswith("\n") else text + "\n")
+        self.count += len(df)
+
+    def tell(self) -> int:
+        """
+        Bytes escritos hasta ahora (para el checkpoint).
+        """
+        if self._fh is None:
+            return self._size
+        self._fh.flush()
+        return self._fh.tell()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,150 @@
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pymongo.errors import BulkWriteError
+
+import db
+
+# Filas por INSERT multi-fila / insert_many.
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "5000"))
+
+# Columnas que cambian en cada corrida y no forman parte de la identidad del registro
+UNIQUE_ID_EXCLUDE = ("processed_at",)
+
+# Dos claves de hash distintas -> uniqueId de 128 bits (32 caracteres hex)
+_HASH_KEYS = ("0123456789123456", "etl-uniqueid-k02")
+_HEX_BYTES = np.array([f"{i:02x}" for i in range(256)])
+
+DUPLICATE_KEY = 11000
+
+
+def unique_ids(df: pd.DataFrame) -> np.ndarray:
+    """
+    uniqueId por fila (hash del contenido), calculado de forma vectorizada.
+    La misma fila produce siempre el mismo id, sin importar archivo ni corrida.
+    """
+    columns = [c for c in df.columns if c not in UNIQUE_ID_EXCLUDE]
+    parts = [
+        pd.util.hash_pandas_object(df[columns], index=False, hash_key=key)
+        .to_numpy()
+        .astype(">u8")
+        .view(np.uint8)
+        .reshape(-1, 8)
+        for key in _HASH_KEYS
+    ]
+    # cada byte -> 2 caracteres hex, y las 16 celdas U2 contiguas se leen como un U32
+    hex_matrix = np.ascontiguousarray(_HEX_BYTES[np.hstack(parts)])
+    return hex_matrix.view("<U32").ravel()
+
+
+def load_mysql(df: pd.DataFrame, filename: str, ids: np.ndarray,
+               batch_size: int = LOAD_BATCH_SIZE, rollup=None) -> int:
+    """
+    Inserta el bloque en MySQL.processed_records con executemany
+    (mysql-connector lo convierte en INSERT multi-fila).
+    Todo el bloque se confirma en una sola transacción.
+    Los unique_id repetidos se ignoran (índice único), así que recargar
+    un bloque no crea duplicados. Devuelve las filas nuevas.
+    Con `rollup` (rollups.ChunkRollup) los agregados de las filas que esta
+    transacción insertó se suman en la misma transacción: o quedan las
+    filas y sus agregados, o ninguno.
+    """
+    if df.empty:
+        return 0
+
+    loaded_at = datetime.now()
+    # marca las filas de esta transacción, para saber cuáles insertó de verdad
+    load_id = uuid.uuid4().hex
+    # serialización vectorizada: una línea JSON por fila
+    payloads = df.to_json(orient="records", lines=True, date_format="iso").split("\n")
+    ids = ids.tolist()
+
+    inserted = 0
+    new_ids = []
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        for start in range(0, len(df), batch_size):
+            end = start + batch_size
+            batch_ids = ids[start:end]
+            cursor.executemany(
+                "INSERT IGNORE INTO processed_records (unique_id, filename, data, loaded_at, load_id) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [(uid, filename, payload, loaded_at, load_id)
+                 for uid, payload in zip(batch_ids, payloads[start:end])]
+            )
+            inserted += cursor.rowcount
+            if rollup is None or cursor.rowcount == 0:
+                continue
+            if cursor.rowcount == len(batch_ids):
+                new_ids.extend(batch_ids)
+            else:
+                # algunas ya estaban (otro archivo o un reintento): solo cuentan las de este load_id
+                placeholders = ", ".join(["%s"] * len(batch_ids))
+                cursor.execute(
+                    "SELECT unique_id FROM processed_records "
+                    f"WHERE load_id = %s AND unique_id IN ({placeholders})",
+                    (load_id, *batch_ids)
+                )
+                new_ids.extend(row[0] for row in cursor.fetchall())
+        if rollup is not None and new_ids:
+            rollup.mysql(cursor, np.isin(ids, new_ids))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return inserted
+
+
+def load_mongo(df: pd.DataFrame, filename: str, ids: np.ndarray,
+               batch_size: int = LOAD_BATCH_SIZE, rollup=None) -> int:
+    """
+    Inserta el bloque en Mongo.records con insert_many(ordered=False)
+    en lotes de `batch_size` documentos.
+    Los uniqueId repetidos (índice único) se ignoran. Devuelve los documentos nuevos.
+    Con `rollup` los agregados se suman después, solo con los documentos
+    que se insertaron (los repetidos ya se contaron cuando entraron).
+    """
+    if df.empty:
+        return 0
+
+    coll = db.get_mongo_db()["records"]
+    inserted = 0
+    new_rows = np.ones(len(df), dtype=bool)
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size].assign(
+            uniqueId=ids[start:start + batch_size], filename=filename
+        )
+        # NaN/NaT -> None para que Mongo guarde null
+        docs = batch.astype(object).where(batch.notna(), None).to_dict("records")
+        try:
+            inserted += len(coll.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY for err in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            new_rows[[start + err["index"] for err in errors]] = False
+    if rollup is not None and inserted:
+        rollup.mongo(new_rows)
+    return inserted
+
+
+def load_chunk(df: pd.DataFrame, filename: str, batch_size: int = LOAD_BATCH_SIZE,
+               rollup=None) -> int:
+    """
+    Etapa Load: guarda los registros procesados de un bloque en MySQL y Mongo.
+    Devuelve las filas nuevas en MySQL (las repetidas son no-ops).
+    `rollup` (rollups.ChunkRollup) suma a cada base los agregados de las
+    filas que esa base insertó.
+    """
+    ids = unique_ids(df)
+    inserted = load_mysql(df, filename, ids, batch_size, rollup)
+    load_mongo(df, filename, ids, batch_size, rollup)
+    return inserted
@@ -0,0 +1,138 @@
+import glob
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, start_http_server
+from prometheus_client import multiprocess
+
+# Métricas Prometheus del worker, expuestas en http://<worker>:WORKER_METRICS_PORT/metrics.
+# Con el pool prefork cada proceso hijo escribe sus valores en
+# PROMETHEUS_MULTIPROC_DIR y el exportador (en el proceso principal) los suma.
+# Sin esa variable (p.ej. --pool=solo) se usa el registro normal del proceso.
+# Todas las métricas tienen labels, así no se crea ningún valor al importar
+# (antes del fork) y el directorio se puede limpiar al arrancar.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9808"))
+
+# de 1 ms a ~10 min
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+                   120, 300, 600)
+RATE_BUCKETS = (100, 1e3, 5e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 5e7, 1e8)
+
+STAGE_SECONDS = Histogram(
+    "etl_stage_seconds",
+    "Tiempo por bloque o por archivo de cada etapa (types, read, transform, write, load, "
+    "rollup, mysql_log, mongo_log, merge)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+TASK_SECONDS = Histogram(
+    "etl_task_seconds",
+    "Duración de la tarea completa",
+    ["task", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "etl_queue_wait_seconds",
+    "Tiempo desde que se publicó la tarea hasta que un worker la empezó",
+    ["task"],
+    buckets=LATENCY_BUCKETS,
+)
+ROWS_PER_SECOND = Histogram(
+    "etl_rows_per_second",
+    "Filas del CSV procesadas por segundo, por archivo o shard",
+    ["task"],
+    buckets=RATE_BUCKETS,
+)
+BYTES_PER_SECOND = Histogram(
+    "etl_bytes_per_second",
+    "Bytes del CSV procesados por segundo, por archivo o shard",
+    ["task"],
+    buckets=RATE_BUCKETS,
+)
+ROWS = Counter(
+    "etl_rows",
+    "Filas procesadas (in, ok, rejected, loaded)",
+    ["kind"],
+)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Mide el bloque de código como la etapa `name`.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - t0)
+
+
+def timed_chunks(chunks, name: str = "read"):
+    """
+    Envuelve el iterador de bloques del lector: mide cuánto tarda cada bloque
+    en llegar (lectura y parseo del CSV).
+    """
+    iterator = iter(chunks)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - t0)
+        yield chunk
+
+
+def observe_queue_wait(task):
+    """
+    `enqueued_at` lo agrega al mensaje el productor (before_task_publish).
+    """
+    enqueued_at = task.request.get("enqueued_at")
+    if enqueued_at:
+        QUEUE_WAIT_SECONDS.labels(task.name).observe(max(time.time() - float(enqueued_at), 0))
+
+
+def observe_task(task_name: str, result: dict, seconds: float, size_bytes: int = None):
+    """
+    Duración y throughput de un archivo o shard terminado.
+    """
+    status = result.get("status", "unknown")
+    TASK_SECONDS.labels(task_name, status).observe(seconds)
+    if status != "ok" or seconds <= 0:
+        return
+    rows_in = result.get("rows_in") or 0
+    ROWS_PER_SECOND.labels(task_name).observe(rows_in / seconds)
+    if size_bytes:
+        BYTES_PER_SECOND.labels(task_name).observe(size_bytes / seconds)
+    for kind in ("rows_in", "rows_ok", "rows_rejected", "rows_loaded"):
+        if result.get(kind):
+            ROWS.labels(kind[len("rows_"):]).inc(result[kind])
+
+
+def start_exporter():
+    """
+    Levanta el servidor HTTP de /metrics en el proceso principal del worker
+    (worker_init, antes de crear los procesos hijos).
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+        # valores de una corrida anterior del contenedor
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(WORKER_METRICS_PORT, registry=registry)
+    else:
+        start_http_server(WORKER_METRICS_PORT)
+    print(f"Métricas del worker en :{WORKER_METRICS_PORT}/metrics")
+
+
+def process_exited(pid: int):
+    """
+    Limpia los valores de un proceso hijo que terminó (gauges en modo live).
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,164 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from reader import apply_column_types
+
+# Formato del archivo processed_*: "csv" (como siempre) o "parquet"
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv")
+# Escribir cada columna con el tipo que pandas infiere en todo el archivo
+# (reader.infer_column_types); "0" escribe los valores tal como se leyeron
+# (en Parquet, todas las columnas como texto)
+OUTPUT_INFER_TYPES = os.getenv("OUTPUT_INFER_TYPES", "1") == "1"
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+OUTPUT_FORMATS = ("csv", "parquet")
+
+# tipo de reader.infer_column_types -> tipo de la columna en Parquet
+ARROW_TYPES = {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(),
+               "object": pa.string()}
+
+
+def output_name(csv_name: str, fmt: str) -> str:
+    """
+    Nombre del archivo de salida: processed_<archivo>.csv o processed_<archivo>.parquet
+    """
+    if fmt == "parquet":
+        csv_name = os.path.splitext(csv_name)[0] + ".parquet"
+    return f"processed_{csv_name}"
+
+
+class CsvOutput:
+    """
+    Agrega bloques a un CSV; solo el primer bloque escribe la cabecera.
+    Con `offset` se retoma un archivo a medias: se descarta lo escrito
+    después de ese byte (el último checkpoint) y se sigue agregando.
+    Con `column_types` (reader.infer_column_types) los números y booleanos
+    se escriben como los escribía pandas leyendo el archivo entero
+    (1.50 -> 1.5, 007 -> 7, y 2 -> 2.0 si la columna tiene decimales).
+    """
+
+    def __init__(self, path: str, header: bool = True, offset: int = None,
+                 column_types: dict = None):
+        self._column_types = column_types
+        if offset is None:
+            self._fh = open(path, "w", newline="", encoding="utf-8")
+        else:
+            os.truncate(path, offset)
+            self._fh = open(path, "a", newline="", encoding="utf-8")
+            header = header and offset == 0
+        self._header = header
+
+    def write(self, df):
+        if self._column_types:
+            df = apply_column_types(df, self._column_types)
+        df.to_csv(self._fh, index=False, header=self._header)
+        self._header = False
+
+    def tell(self) -> int:
+        """
+        Bytes escritos hasta ahora, ya pasados al sistema operativo.
+        """
+        self._fh.flush()
+        return self._fh.tell()
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetOutput:
+    """
+    Escribe cada bloque como un row group de un Parquet comprimido y tipado.
+    Los bloques llegan como texto: con `column_types` (reader.infer_column_types)
+    cada columna se convierte al tipo que tiene en todo el archivo antes de
+    armar el esquema, así un bloque con solo enteros en una columna con
+    decimales no fija int64. El esquema sale del primer bloque ya convertido;
+    los demás se convierten a ese esquema.
+    """
+
+    def __init__(self, path: str, compression: str = PARQUET_COMPRESSION,
+                 column_types: dict = None):
+        self._path = path
+        self._compression = compression
+        self._column_types = column_types or {}
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        if self._column_types:
+            df = apply_column_types(df, self._column_types)
+        if self._writer is None:
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            for i, field in enumerate(schema):
+                if pa.types.is_null(field.type):
+                    # columna toda nula en el primer bloque: el tipo del archivo, o texto
+                    kind = self._column_types.get(field.name, "object")
+                    schema = schema.set(i, field.with_type(ARROW_TYPES[kind]))
+                elif pa.types.is_large_string(field.type):
+                    # el dtype str de pandas sale como large_string; alcanza con string
+                    schema = schema.set(i, field.with_type(pa.string()))
+            self._schema = schema
+            self._writer = pq.ParquetWriter(self._path, schema, compression=self._compression)
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        # un row group por bloque procesado
+        self._writer.write_table(table, row_group_size=max(len(df), 1))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_output(path: str, fmt: str, header: bool = True, offset: int = None,
+                column_types: dict = None):
+    """
+    `offset` retoma una salida a medias (solo CSV: un Parquet sin cerrar
+    no tiene footer y no se puede reabrir para agregar row groups).
+    """
+    if fmt == "csv":
+        return CsvOutput(path, header=header, offset=offset, column_types=column_types)
+    if fmt == "parquet":
+        if offset is not None:
+            raise ValueError("La salida Parquet no se puede retomar")
+        return ParquetOutput(path, column_types=column_types)
+    raise ValueError(f"Formato de salida desconocido: {fmt}")
+
+
+def merge_parquet(parts, out_path: str):
+    """
+    Une varios Parquet (salidas de shards) copiando row group por row group,
+    así la memoria no depende del tamaño total.
+    """
+    writer = None
+    try:
+        for part in parts:
+            source = pq.ParquetFile(part, memory_map=True)
+            if writer is None:
+                schema = source.schema_arrow
+                writer = pq.ParquetWriter(out_path, schema, compression=PARQUET_COMPRESSION)
+            for i in range(source.num_row_groups):
+                writer.write_table(source.read_row_group(i).cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def read_processed(path: str, columns: list = None) -> pa.Table:
+    """
+    Lee un processed_*.parquet como tabla Arrow usando memory-map (sin copiar
+    el archivo a memoria; solo se descomprimen las columnas pedidas).
+    Para pandas: read_processed(path).to_pandas().
+    """
+    return pq.read_table(path, columns=columns, memory_map=True)
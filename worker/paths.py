@@ -0,0 +1,8 @@
+import os
+
+# Directorios del volumen compartido (la API y el worker montan ./data -> /data).
+# Viven acá y no en tasks.py para que retention.py y watcher.py los usen sin
+# importar la app de Celery.
+DATA_DIR = "/data"
+INBOUND_DIR = os.path.join(DATA_DIR, "inbound")
+PROCESSED_DIR = os.path.join(DATA_DIR, "processed")
@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Profiler por muestreo para investigar una tarea lenta puntual.
+# Un hilo aparte mira cada PROFILE_INTERVAL segundos la pila del hilo de la
+# tarea con sys._current_frames(): el código de la tarea no se instrumenta y
+# el costo es un muestreo por intervalo, no por llamada.
+# Se activa por tarea (kwarg profile=True, p.ej. /api/upload?profile=true) o
+# para todas con ETL_PROFILE=1. El resultado queda en
+# /data/profiles/<task_id>.folded, una línea "func;func;func muestras" por
+# pila: se abre con flamegraph.pl o speedscope.
+PROFILES_DIR = os.path.join("/data", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+ETL_PROFILE = os.getenv("ETL_PROFILE", "0") == "1"
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.path = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                # de la raíz a la hoja, como espera el formato folded
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        self.path = path
+
+
+@contextmanager
+def profiled(name: str, enabled: bool = False):
+    """
+    Perfila el hilo actual mientras dura el bloque si `enabled` (o ETL_PROFILE).
+    Devuelve el profiler (None si no está activo); al salir `profiler.path`
+    tiene el archivo .folded.
+    """
+    if not (enabled or ETL_PROFILE):
+        yield None
+        return
+    profiler = SamplingProfiler(threading.get_ident())
+    t0 = time.perf_counter()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        profiler.write_folded(os.path.join(PROFILES_DIR, f"{name}.folded"))
+        print(f"Perfil de {name}: {sum(profiler.samples.values())} muestras en "
+              f"{time.perf_counter() - t0:.1f}s -> {profiler.path}")
@@ -0,0 +1,341 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+# Los mismos valores que pandas.read_csv toma como nulos por defecto,
+# así la salida no cambia respecto de leer con pandas.
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Valores que pandas.read_csv lee como booleanos por defecto
+BOOL_VALUES = {"True": True, "TRUE": True, "true": True,
+               "False": False, "FALSE": False, "false": False}
+# Enteros y flotantes tal como los acepta el parser de pandas (espacios alrededor,
+# signo, exponente, inf/infinity en cualquier mayúscula)
+INT_PATTERN = r"^\s*[+-]?\d+\s*$"
+FLOAT_PATTERN = r"^\s*[+-]?((\d+\.?\d*|\.\d+)(e[+-]?\d+)?|inf|infinity)\s*$"
+INT64_MAX_DIGITS = 18
+
+# CSV comprimidos que se aceptan en /data/inbound (extensión -> códec de Arrow).
+# Se leen descomprimiendo en streaming, sin pasar por un archivo temporal.
+COMPRESSED_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+INPUT_SUFFIXES = (".csv", *(f".csv{suffix}" for suffix in COMPRESSED_SUFFIXES))
+
+
+def compression_of(path: str):
+    """
+    Códec del archivo según su extensión (None si no está comprimido).
+    """
+    return COMPRESSED_SUFFIXES.get(os.path.splitext(path)[1])
+
+
+def plain_name(name: str) -> str:
+    """
+    Nombre sin la extensión de compresión (datos.csv.zst -> datos.csv).
+    """
+    if compression_of(name):
+        return os.path.splitext(name)[0]
+    return name
+
+
+def open_input(path: str):
+    """
+    Abre el CSV para leerlo en streaming, descomprimiéndolo si hace falta.
+    """
+    return pa.input_stream(path, compression=compression_of(path))
+
+
+def iter_csv_chunks(csv_path: str, chunk_size: int, start: int = None, end: int = None,
+                    columns: list = None, on_bad_lines=None, skip_rows: int = 0):
+    """
+    Lee el CSV en bloques de `chunk_size` filas.
+    Los valores se leen como texto para que cada bloque sea independiente
+    de la inferencia de tipos de los demás (la salida no cambia según
+    dónde caiga el corte entre bloques).
+
+    Con `start`/`end` se lee solo ese rango de bytes (un shard); el rango
+    no incluye la cabecera, así que hay que pasar `columns`. Los archivos
+    comprimidos (.csv.gz, .csv.zst) se leen enteros, no por rangos.
+
+    Las líneas con más o menos campos que la cabecera no cortan la lectura:
+    se saltan y se informan a `on_bad_lines(lines, reasons, raws)`.
+    El índice de cada bloque es el número de línea de cada fila (la cabecera
+    es la línea 1; en un shard se cuenta desde su primera línea).
+
+    `skip_rows` saltea esa cantidad de filas de datos (buenas o mal formadas)
+    sin transformarlas, para retomar desde un checkpoint; la numeración de
+    líneas sigue siendo la del archivo.
+
+    Se usa el lector CSV de Arrow y no pandas.read_csv(chunksize=...):
+    pandas no detecta una fila con campos de más si cae primera en un bloque
+    (la toma como índice y la recorta sin avisar).
+    """
+    if start is None:
+        # los nombres de read_header (duplicados renombrados como en pandas) y no los del archivo
+        columns, _ = read_header(csv_path)
+        read_options = pv.ReadOptions(column_names=columns, skip_rows=1,
+                                      skip_rows_after_names=skip_rows)
+        with open_input(csv_path) as source:
+            yield from _read_chunks(source, read_options, columns, chunk_size, 2 + skip_rows,
+                                    on_bad_lines)
+        return
+
+    with open(csv_path, "rb") as fh:
+        fh.seek(start)
+        read_options = pv.ReadOptions(column_names=columns, skip_rows=skip_rows)
+        source = pa.PythonFile(ByteRangeReader(fh, end - start), mode="r")
+        yield from _read_chunks(source, read_options, columns, chunk_size, 1 + skip_rows,
+                                on_bad_lines)
+
+
+def _read_chunks(source, read_options, columns: list, chunk_size: int, first_line: int,
+                 on_bad_lines):
+    """
+    Lee en streaming, junta los lotes de Arrow en bloques de `chunk_size`
+    filas y numera cada fila con su línea real.
+    """
+    # líneas malas todavía no informadas y todas las vistas (para numerar)
+    invalid = []
+    bad = []
+
+    def skip_invalid(row):
+        invalid.append((
+            row.number,
+            f"se esperaban {row.expected_columns} campos, hay {row.actual_columns}",
+            row.text,
+        ))
+        if row.number is not None:
+            bad.append(row.number)
+        return "skip"
+
+    reader = pv.open_csv(
+        source,
+        read_options=read_options,
+        parse_options=pv.ParseOptions(newlines_in_values=True, invalid_row_handler=skip_invalid),
+        convert_options=pv.ConvertOptions(
+            column_types={column: pa.string() for column in columns},
+            null_values=NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+
+    good = 0
+
+    def report_invalid(before_line=None):
+        """
+        Informa las líneas malas anteriores a `before_line` (todas si es None).
+        Arrow lee por adelantado, así que puede haber líneas malas de bloques
+        que todavía no se entregaron: esas se informan con su bloque, y filas
+        entregadas + líneas informadas es siempre lo consumido del archivo
+        (lo que usa el checkpoint para retomar).
+        """
+        count = 0
+        while count < len(invalid) and (before_line is None or (invalid[count][0] or 0) < before_line):
+            count += 1
+        if count:
+            report = invalid[:count]
+            del invalid[:count]
+            if on_bad_lines is not None:
+                on_bad_lines(*(list(values) for values in zip(*report)))
+
+    def numbered(table):
+        nonlocal good
+        chunk = table.to_pandas()
+        # fila buena g (0-based) -> línea g + first_line + líneas malas anteriores a ella
+        rows = np.arange(good, good + len(chunk))
+        good += len(chunk)
+        if bad:
+            marks = np.asarray(bad) - np.arange(len(bad))
+            rows = rows + np.searchsorted(marks, rows + first_line, side="right")
+        chunk.index = rows + first_line
+        return chunk
+
+    pending = reader.schema.empty_table()
+    emitted = False
+    for batch in reader:
+        pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+        while pending.num_rows >= chunk_size:
+            chunk = numbered(pending.slice(0, chunk_size))
+            report_invalid(chunk.index[-1])
+            yield chunk
+            pending = pending.slice(chunk_size)
+            emitted = True
+    report_invalid()
+    if pending.num_rows or not emitted:
+        # un archivo con solo cabecera da un bloque vacío (se escribe la cabecera)
+        yield numbered(pending)
+
+
+def infer_column_types(csv_path: str) -> dict:
+    """
+    Tipo de cada columna en todo el archivo, como lo infiere pandas.read_csv:
+    {columna: "int" | "float" | "bool" | "object"}. Los bloques se leen como
+    texto (ver iter_csv_chunks) y apply_column_types los convierte antes de
+    escribir, así la salida es la misma que leyendo el archivo entero con
+    pandas aunque un bloque solo tenga enteros y otro decimales o nulos.
+    Es una pasada extra en streaming: la memoria no depende del archivo y
+    una columna que ya resultó texto no se vuelve a mirar.
+    """
+    columns, _ = read_header(csv_path)
+    kinds = {column: set() for column in columns}
+    nulls = dict.fromkeys(columns, False)
+    with open_input(csv_path) as source:
+        reader = pv.open_csv(
+            source,
+            read_options=pv.ReadOptions(column_names=columns, skip_rows=1),
+            parse_options=pv.ParseOptions(newlines_in_values=True,
+                                          invalid_row_handler=lambda row: "skip"),
+            convert_options=pv.ConvertOptions(
+                column_types={column: pa.string() for column in columns},
+                null_values=NA_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            for column, values in zip(columns, batch.columns):
+                if "object" in kinds[column]:
+                    continue
+                nulls[column] = nulls[column] or values.null_count > 0
+                values = values.drop_null()
+                if len(values):
+                    kinds[column].add(_value_kind(values))
+    return {column: _column_type(kinds[column], nulls[column]) for column in columns}
+
+
+def _value_kind(values: pa.Array) -> str:
+    if pc.all(pc.match_substring_regex(values, INT_PATTERN)).as_py():
+        long = pc.filter(values, pc.greater(pc.utf8_length(values), INT64_MAX_DIGITS)).to_pylist()
+        # más allá de int64 pandas deja el texto tal cual
+        if all(-2 ** 63 <= int(value) < 2 ** 63 for value in long):
+            return "int"
+        return "object"
+    if pc.all(pc.match_substring_regex(values, FLOAT_PATTERN, ignore_case=True)).as_py():
+        return "float"
+    if pc.all(pc.is_in(values, value_set=pa.array(list(BOOL_VALUES)))).as_py():
+        return "bool"
+    return "object"
+
+
+def _column_type(kinds: set, has_nulls: bool) -> str:
+    if kinds == {"int"}:
+        # un nulo en una columna entera la vuelve float (7 -> 7.0)
+        return "float" if has_nulls else "int"
+    if kinds and kinds <= {"int", "float"}:
+        return "float"
+    if kinds == {"bool"}:
+        return "bool"
+    # texto, mezclas o columna toda nula: se escribe como se leyó
+    return "object"
+
+
+def apply_column_types(df: pd.DataFrame, column_types: dict) -> pd.DataFrame:
+    """
+    Convierte las columnas que siguen como texto al tipo de infer_column_types.
+    Las que el pipeline ya convirtió (coerce) o que dejaron de ser numéricas
+    (p.ej. por derive) se dejan como están.
+    """
+    converted = {}
+    for column, kind in column_types.items():
+        if kind == "object" or column not in df.columns:
+            continue
+        values = df[column]
+        if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+            continue
+        try:
+            if kind == "bool":
+                if not (values.isin(BOOL_VALUES) | values.isna()).all():
+                    continue
+                converted[column] = values.map(BOOL_VALUES)
+            else:
+                # to_numeric usa el mismo parser que read_csv (mismo redondeo de los decimales)
+                numbers = pd.to_numeric(values)
+                if kind == "float" and pd.api.types.is_integer_dtype(numbers):
+                    # bloque con solo enteros en una columna float: read_csv deja "-0" como -0.0
+                    negative = values.str.lstrip().str.startswith("-").to_numpy(dtype=bool)
+                    numbers = numbers.astype("float64").mask((numbers == 0) & negative, -0.0)
+                converted[column] = numbers.astype("int64" if kind == "int" else "float64")
+        except (ValueError, TypeError):
+            continue
+    return df.assign(**converted) if converted else df
+
+
+class ByteRangeReader:
+    """
+    Objeto tipo archivo que entrega como máximo `length` bytes de `fh`
+    desde su posición actual. Arrow lo lee como si fuera un archivo entero.
+    """
+
+    closed = False
+
+    def __init__(self, fh, length: int):
+        self._fh = fh
+        self._remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fh.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        line = self._fh.readline(size)
+        self._remaining -= len(line)
+        return line
+
+    def readable(self) -> bool:
+        return True
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+def read_header(csv_path: str):
+    """
+    Devuelve (columnas, offset del primer byte de datos).
+    Los nombres repetidos se renombran como en pandas.read_csv (a, a.1, ...),
+    así la salida tiene la misma cabecera que leyendo con pandas.
+    El offset solo tiene sentido sin comprimir (los comprimidos no se dividen).
+    """
+    with open_input(csv_path) as fh:
+        columns = list(pd.read_csv(fh, nrows=0).columns)
+    with open(csv_path, "rb") as fh:
+        fh.readline()
+        data_start = fh.tell()
+    return columns, data_start
+
+
+def shard_ranges(csv_path: str, data_start: int, shard_bytes: int):
+    """
+    Divide la parte de datos del archivo en rangos de ~`shard_bytes` bytes.
+    Cada corte se mueve hasta el siguiente salto de línea para que ninguna
+    fila quede partida. No sirve para CSV con saltos de línea dentro de
+    campos entre comillas (esos archivos se procesan sin dividir).
+    """
+    size = os.path.getsize(csv_path)
+    ranges = []
+    with open(csv_path, "rb") as fh:
+        start = data_start
+        while start < size:
+            cut = start + shard_bytes
+            if cut >= size:
+                end = size
+            else:
+                fh.seek(cut)
+                fh.readline()
+                end = min(fh.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
@@ -0,0 +1,241 @@
+"""
+Archiva y poda /data/inbound y /data/processed para que el volumen
+compartido no se llene.
+
+Uso (servicio `retention` de docker-compose):
+    python retention.py           # una pasada cada RETENTION_INTERVAL segundos
+    python retention.py --once    # una pasada y termina
+
+- Un CSV de inbound se archiva cuando ya se procesó (tiene fila en
+  upload_logs) y no se modificó en ARCHIVE_AFTER_HOURS horas. Las salidas de
+  processed se archivan solo por antigüedad. Los ocultos (.x.part de la API,
+  .x.partNNNNN de los shards) no se tocan.
+- El archivo se copia en streaming a /data/archive/<inbound|processed>/<fecha>/
+  comprimido con ARCHIVE_COMPRESSION (zstd o gzip), se registra en
+  MySQL.archived_files y recién entonces se borra el original. Los que ya
+  vienen comprimidos (.csv.gz, .csv.zst, .parquet) se mueven tal cual.
+- Los archivados se borran después de RETENTION_DAYS días, y también los más
+  viejos cuando el total pasa de ARCHIVE_MAX_BYTES. La fila del índice queda
+  con pruned_at, así se distingue un archivo podado de uno que nunca existió.
+- Con archived_files los output_file de Mongo.uploads y MySQL.task_states
+  siguen resolviendo al archivo archivado (/api/files/resolve en la API).
+"""
+import argparse
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+from mysql.connector import Error
+from pymongo.errors import PyMongoError
+
+import db
+from paths import DATA_DIR, INBOUND_DIR, PROCESSED_DIR
+from reader import compression_of
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(DATA_DIR, "archive"))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+ARCHIVE_AFTER_HOURS = float(os.getenv("ARCHIVE_AFTER_HOURS", "24"))
+# 0 = los archivados no vencen por antigüedad / no hay tope de tamaño
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "90"))
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", "0"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+# Tamaño de cada lectura al copiar (la memoria no depende del archivo)
+ARCHIVE_BLOCK_SIZE = 16 * 1024 * 1024
+# Nombres por consulta a upload_logs
+LOOKUP_BATCH_SIZE = 500
+
+# códec -> extensión del archivo archivado
+CODEC_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+
+def candidates(directory: str, older_than: float) -> list:
+    """
+    Archivos visibles de `directory` sin modificar desde `older_than` (epoch),
+    como (ruta, stat).
+    """
+    found = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            st = entry.stat()
+            if st.st_mtime < older_than:
+                found.append((entry.path, st))
+    return found
+
+
+def processed_names(names: list) -> set:
+    """
+    Nombres de archivos de inbound que ya tienen su registro en upload_logs.
+    """
+    found = set()
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+            batch = names[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"SELECT DISTINCT filename FROM upload_logs WHERE filename IN ({placeholders})",
+                tuple(batch)
+            )
+            found.update(row[0] for row in cursor.fetchall())
+    finally:
+        conn.close()
+    return found
+
+
+def save_entry(original_path: str, kind: str, archive_path: str, compression: str,
+               st: os.stat_result):
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "REPLACE INTO archived_files (original_path, kind, archive_path, compression, "
+            "original_bytes, archived_bytes, modified_at, archived_at, pruned_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NULL)",
+            (original_path, kind, archive_path, compression, st.st_size,
+             os.path.getsize(archive_path) if os.path.exists(archive_path) else st.st_size,
+             datetime.fromtimestamp(st.st_mtime), datetime.now())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def archive_file(path: str, kind: str, st: os.stat_result) -> str:
+    """
+    Archiva un archivo y lo borra de su carpeta. Devuelve la ruta archivada.
+    Si se corta a la mitad, el original sigue en su lugar y la próxima
+    pasada lo vuelve a archivar.
+    """
+    name = os.path.basename(path)
+    day = datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d")
+    target_dir = os.path.join(ARCHIVE_DIR, kind, day)
+    os.makedirs(target_dir, exist_ok=True)
+
+    if compression_of(name) or name.endswith(".parquet"):
+        # ya comprimido (el Parquet comprime cada columna): se mueve sin recomprimir.
+        # Primero el índice: si el movimiento falla la fila se corrige en la próxima pasada
+        archive_path = os.path.join(target_dir, name)
+        save_entry(path, kind, archive_path, compression_of(name), st)
+        shutil.move(path, archive_path)
+        return archive_path
+
+    archive_path = os.path.join(target_dir, name + CODEC_SUFFIXES[ARCHIVE_COMPRESSION])
+    tmp_path = os.path.join(target_dir, f".{os.path.basename(archive_path)}.tmp")
+    try:
+        with open(path, "rb") as src, \
+                pa.output_stream(tmp_path, compression=ARCHIVE_COMPRESSION) as dst:
+            shutil.copyfileobj(src, dst, ARCHIVE_BLOCK_SIZE)
+        os.replace(tmp_path, archive_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    save_entry(path, kind, archive_path, ARCHIVE_COMPRESSION, st)
+    os.remove(path)
+    return archive_path
+
+
+def archive(now: float) -> dict:
+    """
+    Archiva lo que ya cumplió ARCHIVE_AFTER_HOURS en inbound y processed.
+    """
+    older_than = now - ARCHIVE_AFTER_HOURS * 3600
+    inbound = candidates(INBOUND_DIR, older_than)
+    done = processed_names([os.path.basename(path) for path, _ in inbound])
+    pending = [(path, st, "inbound") for path, st in inbound if os.path.basename(path) in done]
+    pending += [(path, st, "processed") for path, st in candidates(PROCESSED_DIR, older_than)]
+
+    stats = {"archived": 0, "original_bytes": 0, "archived_bytes": 0}
+    for path, st, kind in pending:
+        try:
+            archive_path = archive_file(path, kind, st)
+        except (OSError, Error) as e:
+            print(f"Error archivando {path}:", e)
+            continue
+        stats["archived"] += 1
+        stats["original_bytes"] += st.st_size
+        stats["archived_bytes"] += os.path.getsize(archive_path)
+    return stats
+
+
+def prune(now: datetime) -> int:
+    """
+    Borra los archivados vencidos (RETENTION_DAYS) y, si el total sigue
+    pasando ARCHIVE_MAX_BYTES, los más viejos hasta quedar por debajo.
+    Devuelve cuántos se borraron.
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT original_path, archive_path, archived_bytes, archived_at FROM archived_files "
+            "WHERE pruned_at IS NULL ORDER BY archived_at DESC"
+        )
+        rows = cursor.fetchall()
+
+        expired = []
+        total = 0
+        cutoff = now - timedelta(days=RETENTION_DAYS) if RETENTION_DAYS else None
+        for original_path, archive_path, size, archived_at in rows:
+            # del más nuevo al más viejo: lo que pasa del tope es lo más viejo
+            total += size or 0
+            if ((cutoff is not None and archived_at < cutoff)
+                    or (ARCHIVE_MAX_BYTES and total > ARCHIVE_MAX_BYTES)):
+                expired.append((original_path, archive_path))
+
+        for original_path, archive_path in expired:
+            try:
+                os.remove(archive_path)
+            except FileNotFoundError:
+                pass
+            cursor.execute(
+                "UPDATE archived_files SET pruned_at = %s WHERE original_path = %s",
+                (now, original_path)
+            )
+            conn.commit()
+        return len(expired)
+    finally:
+        conn.close()
+
+
+def run_once():
+    t0 = time.perf_counter()
+    stats = archive(time.time())
+    stats["pruned"] = prune(datetime.now())
+    ratio = (stats["archived_bytes"] / stats["original_bytes"]) if stats["original_bytes"] else None
+    print(f"Retención: {stats['archived']} archivados "
+          f"({stats['original_bytes']} -> {stats['archived_bytes']} bytes"
+          f"{f', {ratio:.0%}' if ratio is not None else ''}), "
+          f"{stats['pruned']} podados en {time.perf_counter() - t0:.1f}s")
+    return stats
+
+
+def run(once: bool = False):
+    if ARCHIVE_COMPRESSION not in CODEC_SUFFIXES:
+        raise SystemExit(f"ARCHIVE_COMPRESSION desconocido: {ARCHIVE_COMPRESSION}")
+    schema_ready = False
+    while True:
+        try:
+            if not schema_ready:
+                # archived_files la crea el worker al arrancar; por si este servicio llega antes
+                db.bootstrap_schema()
+                schema_ready = True
+            run_once()
+        except (Error, PyMongoError) as e:
+            # sin MySQL no hay índice: no se archiva nada hasta la próxima pasada
+            print("Error de base de datos en la retención:", e)
+        if once:
+            return
+        time.sleep(RETENTION_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+    run(args.once)
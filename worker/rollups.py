@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+import db
+import metrics
+from loaders import LOAD_BATCH_SIZE
+
+# Agregados por sensor para el dashboard (MySQL.sensor_rollups y Mongo.sensor_rollups):
+# count, min, max y sum de cada métrica por minuto, hora y día (mean = sum / count).
+# Se calculan con group-by vectorizados sobre cada bloque ya transformado y
+# se suman a lo guardado con upserts, así una consulta de un año lee ~365
+# filas por métrica en vez de recorrer los registros.
+# Cada base agrega solo las filas que su carga insertó de verdad (ver
+# loaders.load_chunk): las que el índice único de uniqueId descarta (un
+# reintento, un bloque repetido al retomar, el mismo dato en otro archivo)
+# ya se contaron cuando entraron, así que reprocesar no cuenta dos veces.
+# En MySQL las filas y sus agregados se confirman en la misma transacción.
+# En Mongo van en dos escrituras: si la tarea se cae entre el insert_many y
+# el bulk_write de los agregados, esos documentos quedan sin contar (nunca
+# contados dos veces).
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "1") == "1"
+ROLLUP_SENSOR_COLUMN = os.getenv("SENSOR_COLUMN", "sensorId")
+ROLLUP_TIME_COLUMN = os.getenv("ROLLUP_TIME_COLUMN", "timestamp")
+ROLLUP_METRICS = [
+    m.strip() for m in os.getenv("ROLLUP_METRICS", "temperature,humidity,pressure").split(",")
+    if m.strip()
+]
+
+# resolución -> frecuencia de pandas, de la más fina a la más gruesa
+RESOLUTIONS = {"minute": "min", "hour": "h", "day": "D"}
+
+KEY = ["sensor_id", "metric", "bucket_start"]
+
+
+def compute(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agregados del bloque: una fila por (resolution, sensor_id, metric, bucket_start)
+    con count, min, max y sum. Las horas y días salen de los minutos,
+    no de volver a agrupar las filas crudas. Los tiempos quedan en UTC.
+    """
+    metrics = [m for m in ROLLUP_METRICS if m in df.columns]
+    if not metrics or ROLLUP_SENSOR_COLUMN not in df.columns or ROLLUP_TIME_COLUMN not in df.columns:
+        return pd.DataFrame()
+
+    ts = pd.to_datetime(df[ROLLUP_TIME_COLUMN], errors="coerce", utc=True).dt.tz_localize(None)
+    values = df[metrics].apply(pd.to_numeric, errors="coerce")
+    long = (
+        values.assign(sensor_id=df[ROLLUP_SENSOR_COLUMN].astype("string"), ts=ts)
+        .melt(id_vars=["sensor_id", "ts"], value_vars=metrics, var_name="metric")
+        .dropna()
+    )
+    if long.empty:
+        return pd.DataFrame()
+
+    minute = (
+        long.assign(bucket_start=long["ts"].dt.floor(RESOLUTIONS["minute"]))
+        .groupby(KEY, observed=True)["value"]
+        .agg(["count", "min", "max", "sum"])
+        .reset_index()
+    )
+    parts = [minute.assign(resolution="minute")]
+    for resolution in ("hour", "day"):
+        coarser = (
+            minute.assign(bucket_start=minute["bucket_start"].dt.floor(RESOLUTIONS[resolution]))
+            .groupby(KEY, observed=True)
+            .agg({"count": "sum", "min": "min", "max": "max", "sum": "sum"})
+            .reset_index()
+        )
+        parts.append(coarser.assign(resolution=resolution))
+    return pd.concat(parts, ignore_index=True)
+
+
+def upsert_mysql(rollup: pd.DataFrame, cursor):
+    """
+    Suma los agregados a MySQL.sensor_rollups con el cursor de la transacción
+    de carga (la confirma loaders.load_mysql).
+    Las filas van en el orden de la clave primaria: dos shards que actualizan
+    las mismas horas toman los locks en el mismo orden (sin deadlocks).
+    """
+    rollup = rollup.sort_values(["resolution", *KEY])
+    rows = list(zip(
+        rollup["resolution"], rollup["sensor_id"], rollup["metric"],
+        rollup["bucket_start"].dt.to_pydatetime(), rollup["count"].tolist(),
+        rollup["min"].tolist(), rollup["max"].tolist(), rollup["sum"].tolist(),
+    ))
+    for start in range(0, len(rows), LOAD_BATCH_SIZE):
+        cursor.executemany(
+            "INSERT INTO sensor_rollups (resolution, sensor_id, metric, bucket_start, count, "
+            "min_value, max_value, sum_value) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE count = count + VALUES(count), "
+            "min_value = LEAST(min_value, VALUES(min_value)), "
+            "max_value = GREATEST(max_value, VALUES(max_value)), "
+            "sum_value = sum_value + VALUES(sum_value)",
+            rows[start:start + LOAD_BATCH_SIZE]
+        )
+
+
+def upsert_mongo(rollup: pd.DataFrame):
+    """
+    Lo mismo en Mongo.sensor_rollups con $inc / $min / $max en un solo bulk_write.
+    """
+    ops = [
+        UpdateOne(
+            {"resolution": resolution, "sensorId": sensor_id, "metric": metric,
+             "bucket": bucket},
+            {"$inc": {"count": count, "sum": total}, "$min": {"min": low},
+             "$max": {"max": high}},
+            upsert=True,
+        )
+        for resolution, sensor_id, metric, bucket, count, low, high, total in zip(
+            rollup["resolution"], rollup["sensor_id"], rollup["metric"],
+            rollup["bucket_start"].dt.to_pydatetime(), rollup["count"].tolist(),
+            rollup["min"].tolist(), rollup["max"].tolist(), rollup["sum"].tolist(),
+        )
+    ]
+    db.get_mongo_db()["sensor_rollups"].bulk_write(ops, ordered=False)
+
+
+class ChunkRollup:
+    """
+    Etapa Rollup de un bloque, la llama la carga de cada base con la máscara
+    de filas que insertó. Casi siempre las dos bases insertan las mismas
+    filas, así que el último agregado calculado se reutiliza.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._last = None
+
+    def compute(self, new_rows: np.ndarray) -> pd.DataFrame:
+        if self._last is not None and np.array_equal(self._last[0], new_rows):
+            return self._last[1]
+        rollup = compute(self.df[new_rows])
+        self._last = (new_rows, rollup)
+        return rollup
+
+    def mysql(self, cursor, new_rows: np.ndarray):
+        with metrics.stage("rollup"):
+            rollup = self.compute(new_rows)
+            if not rollup.empty:
+                upsert_mysql(rollup, cursor)
+
+    def mongo(self, new_rows: np.ndarray):
+        with metrics.stage("rollup"):
+            rollup = self.compute(new_rows)
+            if not rollup.empty:
+                upsert_mongo(rollup)
+
+
+def for_chunk(df: pd.DataFrame):
+    """
+    ChunkRollup del bloque para loaders.load_chunk, o None si los agregados
+    están desactivados.
+    """
+    if not ROLLUPS_ENABLED or df.empty:
+        return None
+    return ChunkRollup(df)
@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import db
+
+# Progreso de los archivos grandes divididos en shards (MySQL.csv_jobs / csv_shards).
+
+
+def create_job(job_id: str, csv_path: str, out_path: str, content_hash: str,
+               processed_at: datetime, ranges):
+    """
+    Registra el trabajo y un shard pendiente por cada rango de bytes.
+    """
+    now = datetime.now()
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute(
+            "INSERT INTO csv_jobs (job_id, csv_path, out_path, content_hash, processed_at, "
+            "shards_total, shards_done, rows_in, rows_loaded, status, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, 0, 0, 0, 'running', %s, %s)",
+            (job_id, csv_path, out_path, content_hash, processed_at, len(ranges), now, now)
+        )
+        cursor.executemany(
+            "INSERT INTO csv_shards (job_id, shard_index, byte_start, byte_end, rows_in, "
+            "rows_loaded, status, updated_at) VALUES (%s, %s, %s, %s, 0, 0, 'queued', %s)",
+            [(job_id, i, start, end, now) for i, (start, end) in enumerate(ranges)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def update_shard(job_id: str, index: int, status: str, rows_in: int, rows_loaded: int):
+    """
+    Actualiza el avance de un shard (se llama después de cada bloque).
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE csv_shards SET status = %s, rows_in = %s, rows_loaded = %s, updated_at = %s "
+            "WHERE job_id = %s AND shard_index = %s",
+            (status, rows_in, rows_loaded, datetime.now(), job_id, index)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def finish_shard(job_id: str, index: int, rows_in: int, rows_loaded: int, rows_ok: int = 0,
+                 rows_rejected: int = 0) -> bool:
+    """
+    Marca el shard como terminado y suma sus filas al trabajo.
+    Devuelve True solo para el último shard en terminar (el que lanza el merge).
+    El UPDATE del trabajo bloquea la fila, así que dos shards que terminan
+    a la vez no pueden ver ambos shards_done == shards_total.
+    """
+    now = datetime.now()
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute(
+            "UPDATE csv_shards SET status = 'done', rows_in = %s, rows_loaded = %s, rows_ok = %s, "
+            "rows_rejected = %s, updated_at = %s "
+            "WHERE job_id = %s AND shard_index = %s AND status <> 'done'",
+            (rows_in, rows_loaded, rows_ok, rows_rejected, now, job_id, index)
+        )
+        if cursor.rowcount == 0:
+            # el shard ya se había contado (tarea repetida)
+            conn.commit()
+            return False
+
+        cursor.execute(
+            "UPDATE csv_jobs SET shards_done = shards_done + 1, rows_in = rows_in + %s, "
+            "rows_loaded = rows_loaded + %s, rows_ok = rows_ok + %s, "
+            "rows_rejected = rows_rejected + %s, updated_at = %s WHERE job_id = %s",
+            (rows_in, rows_loaded, rows_ok, rows_rejected, now, job_id)
+        )
+        cursor.execute(
+            "SELECT shards_done, shards_total FROM csv_jobs WHERE job_id = %s",
+            (job_id,)
+        )
+        done, total = cursor.fetchone()
+        conn.commit()
+        return done == total
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str):
+    """
+    Devuelve el trabajo como dict (None si no existe).
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM csv_jobs WHERE job_id = %s", (job_id,))
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def get_job_status(job_id: str):
+    """
+    Solo el estado del trabajo (None si no existe); los shards lo consultan
+    entre bloques para dejar de trabajar si otro shard ya falló.
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status FROM csv_jobs WHERE job_id = %s", (job_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def get_shard_status(job_id: str, index: int):
+    """
+    Estado de un shard (None si no existe); una entrega repetida de un shard
+    ya terminado no vuelve a escribir su .part.
+    """
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT status FROM csv_shards WHERE job_id = %s AND shard_index = %s",
+            (job_id, index)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def set_job_status(job_id: str, status: str):
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE csv_jobs SET status = %s, updated_at = %s WHERE job_id = %s",
+            (status, datetime.now(), job_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from mysql.connector import Error
+
+import db
+
+# Estado de cada tarea en MySQL.task_states, leído por /api/task-status.
+# La API escribe "queued" al encolar; el worker actualiza la etapa
+# (reading, transforming, loading, split) y el resultado final
+# (done, error, duplicate) con los contadores de filas.
+
+TERMINAL_STAGES = ("done", "error", "duplicate")
+
+
+def set_state(task_id: str, stage: str, rows_in: int = None, rows_loaded: int = None,
+              filename: str = None, detail: str = None, output_file: str = None):
+    """
+    Crea o actualiza el estado de la tarea. Los campos en None no se tocan.
+    Un fallo de MySQL no hace fallar la tarea: solo se pierde esta actualización.
+    """
+    if not task_id:
+        return
+    now = datetime.now()
+    try:
+        conn = db.get_mysql_conn()
+    except Error as e:
+        print("Error conectando a MySQL desde worker:", e)
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO task_states (task_id, stage, filename, rows_in, rows_loaded, detail, "
+            "output_file, created_at, updated_at) "
+            "VALUES (%s, %s, %s, COALESCE(%s, 0), COALESCE(%s, 0), %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE stage = VALUES(stage), "
+            "filename = COALESCE(%s, filename), "
+            "rows_in = COALESCE(%s, rows_in), "
+            "rows_loaded = COALESCE(%s, rows_loaded), "
+            "detail = COALESCE(%s, detail), "
+            "output_file = COALESCE(%s, output_file), "
+            "updated_at = VALUES(updated_at)",
+            (task_id, stage, filename, rows_in, rows_loaded, detail, output_file, now, now,
+             filename, rows_in, rows_loaded, detail, output_file)
+        )
+        conn.commit()
+    except Error as e:
+        print("Error guardando estado de la tarea:", e)
+    finally:
+        conn.close()
+
+
+def add_rows(task_id: str, rows_in: int, rows_loaded: int):
+    """
+    Suma filas al estado (shards de un archivo dividido que van terminando).
+    """
+    try:
+        conn = db.get_mysql_conn()
+    except Error as e:
+        print("Error conectando a MySQL desde worker:", e)
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE task_states SET rows_in = rows_in + %s, rows_loaded = rows_loaded + %s, "
+            "updated_at = %s WHERE task_id = %s",
+            (rows_in, rows_loaded, datetime.now(), task_id)
+        )
+        conn.commit()
+    except Error as e:
+        print("Error guardando estado de la tarea:", e)
+    finally:
+        conn.close()
+
+
+def set_result(task_id: str, result: dict, filename: str = None):
+    """
+    Guarda el resultado que devuelve la tarea como estado final.
+    """
+    status = result.get("status")
+    set_state(
+        task_id,
+        "done" if status == "ok" else status,
+        rows_in=result.get("rows_in"),
+        rows_loaded=result.get("rows_loaded"),
+        filename=filename,
+        detail=result.get("detail"),
+        output_file=result.get("output_file"),
+    )
@@ -1,10 +1,33 @@
 import os
-import pandas as pd
-from celery import Celery
-from datetime import datetime
-import mysql.connector
+import shutil
+import time
+import uuid
+from celery import Celery, group
+from celery.signals import (before_task_publish, worker_init, worker_process_init,
+                            worker_process_shutdown)
+from celery.utils.time import get_exponential_backoff_interval
+from kombu import Queue
+from kombu.exceptions import OperationalError as BrokerError
+from datetime import datetime, timezone
 from mysql.connector import Error
-from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import checkpoints
+import db
+import events
+import metrics
+import rollups
+import shards
+import states
+from deadletter import DEADLETTER_DIR, DeadLetter, deadletter_name
+from loaders import LOAD_BATCH_SIZE, load_chunk
+from outputs import (OUTPUT_FORMAT, OUTPUT_FORMATS, OUTPUT_INFER_TYPES, merge_parquet,
+                     open_output, output_name)
+from paths import INBOUND_DIR, PROCESSED_DIR
+from profiler import profiled
+from reader import (compression_of, infer_column_types, iter_csv_chunks, plain_name,
+                    read_header, shard_ranges)
+from transformers import build_pipeline, run_pipeline
 
 celery_app = Celery(
     "etl_worker",
@@ -12,70 +35,419 @@ celery_app = Celery(
     backend=None
 )
 
-DATA_DIR = "/data"
-INBOUND_DIR = os.path.join(DATA_DIR, "inbound")
-PROCESSED_DIR = os.path.join(DATA_DIR, "processed")
+# Dos colas: "interactive" para archivos chicos (la API decide por tamaño)
+# y "bulk" para los grandes, con sus shards y el merge. Cada cola tiene su
+# propio servicio de worker en docker-compose, así un backfill de varios GB
+# no deja esperando a un CSV de 10 filas.
+# Con prefetch 1 cada proceso reserva una sola tarea a la vez: las tareas
+# largas no acaparan mensajes que otro proceso libre podría tomar.
+# procesar_csv y merge_shards confirman el mensaje al empezar: pueden durar
+# más que el consumer_timeout de RabbitMQ (30 min), que reentregaría el
+# mensaje con la primera corrida todavía viva. Solo procesar_shard (rangos
+# de SPLIT_SHARD_BYTES, minutos) usa acks_late: si el proceso muere a mitad
+# (OOM, kill) el mensaje vuelve a la cola y el shard retoma desde su último
+# checkpoint. En ambos casos el lease de checkpoints.py evita que dos
+# entregas escriban los mismos archivos a la vez.
+celery_app.conf.update(
+    task_queues=(Queue("interactive"), Queue("bulk")),
+    task_default_queue="bulk",
+    task_routes={
+        "worker.tasks.procesar_shard": {"queue": "bulk"},
+        "worker.tasks.merge_shards": {"queue": "bulk"},
+    },
+    worker_prefetch_multiplier=int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "1")),
+)
+
+# Cantidad de filas que se leen/transforman/escriben por bloque.
+# La memoria del worker depende de este valor, no del tamaño del archivo.
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "100000"))
+
+# Archivos desde este tamaño se dividen en shards que procesan varios workers
+# en paralelo (0 desactiva la división).
+SPLIT_THRESHOLD_BYTES = int(os.getenv("SPLIT_THRESHOLD_BYTES", str(1024 ** 3)))
+SPLIT_SHARD_BYTES = int(os.getenv("SPLIT_SHARD_BYTES", str(128 * 1024 ** 2)))
+
+# Reintentos ante errores transitorios (MySQL, Mongo o RabbitMQ caídos un
+# momento): backoff exponencial con jitter, de TASK_RETRY_BACKOFF segundos
+# hasta TASK_RETRY_BACKOFF_MAX, como mucho TASK_MAX_RETRIES veces.
+TASK_MAX_RETRIES = int(os.getenv("TASK_MAX_RETRIES", "5"))
+TASK_RETRY_BACKOFF = int(os.getenv("TASK_RETRY_BACKOFF", "2"))
+TASK_RETRY_BACKOFF_MAX = int(os.getenv("TASK_RETRY_BACKOFF_MAX", "300"))
 
 os.makedirs(INBOUND_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
-def mysql_log_upload(filename: str, rows_in: int, processed_at: datetime):
+@worker_init.connect
+def _bootstrap_schema(**kwargs):
     """
-    Inserta un registro en MySQL.upload_logs
+    DDL una sola vez al arrancar el worker, no en cada tarea.
+    Si MySQL o Mongo todavía no responden, cada proceso lo reintenta al
+    pedir su primera conexión (ver db.get_mysql_conn).
     """
     try:
-        conn = mysql.connector.connect(
-            host="mysql",
-            port=3306,
-            user="root",
-            password="root123",
-            database="etl_system"
-        )
+        db.bootstrap_schema()
+    except (Error, PyMongoError) as e:
+        print("Error creando el esquema desde worker (se reintenta en la primera tarea):", e)
+
+
+@worker_init.connect
+def _start_metrics_exporter(**kwargs):
+    try:
+        metrics.start_exporter()
+    except OSError as e:
+        # p.ej. el puerto ya está en uso: el worker sigue sin /metrics
+        print("No se pudo levantar el exportador de métricas:", e)
+
+
+@before_task_publish.connect
+def _stamp_enqueued_at(headers=None, **kwargs):
+    """
+    Marca la hora de publicación (shards, merge y reintentos que encola el
+    worker) para medir la espera en cola.
+    """
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+@worker_process_init.connect
+def _init_db_clients(**kwargs):
+    """
+    Cada proceso hijo crea su propio pool de MySQL y cliente de Mongo
+    (no se comparten conexiones entre procesos después del fork).
+    """
+    try:
+        db.init_process()
     except Error as e:
-        print("Error conectando a MySQL desde worker:", e)
+        # se vuelve a intentar en la primera tarea que use MySQL
+        print("Error creando el pool de MySQL desde worker:", e)
+
+
+@worker_process_shutdown.connect
+def _close_db_clients(**kwargs):
+    db.close_process()
+    metrics.process_exited(os.getpid())
+
+
+def is_transient(exc: Exception) -> bool:
+    return isinstance(exc, BrokerError) or db.is_transient(exc)
+
+
+def retry_later(task, exc: Exception, task_id: str = None):
+    """
+    Si el error es transitorio y quedan intentos, vuelve a encolar la tarea
+    con backoff exponencial (lanza Retry). Si no, vuelve y la tarea termina
+    con error como siempre.
+    `task_id` es el estado que pasa a "retrying" (None para no tocarlo).
+    """
+    if not is_transient(exc) or task.request.retries >= task.max_retries:
         return
+    countdown = get_exponential_backoff_interval(
+        TASK_RETRY_BACKOFF, task.request.retries, TASK_RETRY_BACKOFF_MAX, full_jitter=True
+    )
+    print(f"Error transitorio en {task.name}, reintento en {countdown}s:", exc)
+    states.set_state(task_id, "retrying")
+    raise task.retry(exc=exc, countdown=countdown)
+
 
+def mysql_log_upload(filename: str, rows_in: int, processed_at: datetime, rows_ok: int = None,
+                     rows_rejected: int = None):
+    """
+    Inserta un registro en MySQL.upload_logs.
+    Los errores se propagan para que la tarea se reintente (no se pierde el log).
+    """
+    conn = db.get_mysql_conn()
     try:
         cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS upload_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                filename VARCHAR(255),
-                rows_in INT,
-                processed_at DATETIME
-            )
-        """)
-        conn.commit()
-
         cursor.execute(
-            "INSERT INTO upload_logs (filename, rows_in, processed_at) VALUES (%s, %s, %s)",
-            (filename, rows_in, processed_at)
+            "INSERT INTO upload_logs (filename, rows_in, rows_ok, rows_rejected, processed_at) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (filename, rows_in, rows_ok, rows_rejected, processed_at)
         )
         conn.commit()
     finally:
+        # devuelve la conexión al pool
         conn.close()
 
 
-def mongo_log_upload(filename: str, rows_in: int, output_file: str):
+def mongo_log_upload(filename: str, rows_in: int, output_file: str, rows_ok: int = None,
+                     rows_rejected: int = None, deadletter_file: str = None):
     """
     Inserta metadatos en Mongo uploads
     """
-    client = MongoClient("mongodb://mongo:27017")
-    db = client["etl_system"]
-    coll = db["uploads"]
+    coll = db.get_mongo_db()["uploads"]
     coll.insert_one({
         "filename": filename,
         "rows_in": rows_in,
+        "rows_ok": rows_ok,
+        "rows_rejected": rows_rejected,
         "output_file": output_file,
-        "logged_at": datetime.now().isoformat()
+        "deadletter_file": deadletter_file,
+        # fecha BSON en UTC (el filtro por fechas de /api/mongo/uploads compara fechas)
+        "logged_at": datetime.now(timezone.utc)
     })
 
 
-@celery_app.task(name="worker.tasks.procesar_csv")
-def procesar_csv(csv_path: str):
+def get_file_status(content_hash: str):
+    """
+    Estado del archivo en MySQL.ingested_files (None si no está registrado).
     """
-    Procesa el CSV y escribe resultado en /data/processed/...
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT status FROM ingested_files WHERE content_hash = %s",
+            (content_hash,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def set_file_status(content_hash: str, status: str):
+    """
+    Actualiza el estado del archivo (processing / done / error).
+    """
+    try:
+        conn = db.get_mysql_conn()
+    except Error as e:
+        print("Error conectando a MySQL desde worker:", e)
+        return
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE ingested_files SET status = %s, updated_at = %s WHERE content_hash = %s",
+            (status, datetime.now(), content_hash)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def output_path(csv_path: str, fmt: str = "csv") -> str:
+    # la salida no se comprime: datos.csv.gz -> processed_datos.csv
+    return os.path.join(PROCESSED_DIR, output_name(plain_name(os.path.basename(csv_path)), fmt))
+
+
+def shard_part_path(out_path: str, index: int) -> str:
+    # archivo oculto con la salida de un shard hasta que se hace el merge
+    return os.path.join(os.path.dirname(out_path), f".{os.path.basename(out_path)}.part{index:05d}")
+
+
+def deadletter_path(csv_path: str) -> str:
+    return os.path.join(DEADLETTER_DIR, deadletter_name(plain_name(os.path.basename(csv_path))))
+
+
+class JobCancelled(Exception):
+    """
+    Otro shard del mismo trabajo falló: este deja de procesar.
+    """
+
+
+def discard_shard_outputs(job_id: str, csv_path: str, out_path: str, shards_total: int):
+    """
+    Borra los .part de salida y de dead-letter y los checkpoints de todos los
+    shards de un trabajo que falló (el merge ya no se va a hacer). Un shard
+    que sigue escribiendo lo ve en su próximo bloque y borra lo suyo.
+    """
+    for index in range(shards_total):
+        for path in (shard_part_path(out_path, index),
+                     shard_part_path(deadletter_path(csv_path), index)):
+            if os.path.exists(path):
+                os.remove(path)
+        checkpoints.clear(checkpoints.shard_key(job_id, index))
+
+
+def concat_parts(parts: list, out_path: str):
+    """
+    Concatena archivos de texto (salida CSV o dead-letter de los shards).
+    """
+    with open(out_path, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as fh:
+                shutil.copyfileobj(fh, out, 16 * 1024 * 1024)
+
+
+def resume_point(checkpoint_id: str, csv_path: str, out_path: str, deadletter_file: str,
+                 output_format: str):
+    """
+    Checkpoint desde el que se puede retomar, o None para empezar de cero
+    (no hay, el CSV cambió o la salida quedó más corta que lo confirmado).
+    En Parquet no se retoma: el archivo sin cerrar no se puede reabrir.
+    """
+    if output_format != "csv":
+        return None
+    checkpoint = checkpoints.load(checkpoint_id)
+    if checkpoint is None:
+        return None
+    valid = (
+        checkpoint["csv_size"] == os.path.getsize(csv_path)
+        and os.path.exists(out_path)
+        and os.path.getsize(out_path) >= checkpoint["output_bytes"]
+        and (checkpoint["deadletter_bytes"] == 0
+             or (os.path.exists(deadletter_file)
+                 and os.path.getsize(deadletter_file) >= checkpoint["deadletter_bytes"]))
+    )
+    if not valid:
+        print(f"Checkpoint {checkpoint_id} no coincide con los archivos, se empieza de cero")
+        return None
+    return checkpoint
+
+
+def run_etl(chunks, steps, ctx: dict, out, batch_size: int, on_chunk=None, on_stage=None,
+            counts: dict = None):
+    """
+    Transform -> escritura (`out` de outputs.py) -> Load -> Rollup para cada bloque.
+    `on_stage(stage, rows_in, rows_loaded)` se llama al empezar las etapas
+    "transforming" y "loading" de cada bloque, y `on_chunk(chunk, rows_in,
+    rows_loaded)` después de cada bloque.
+    Las filas que las transformaciones rechazan van a ctx["deadletter"].
+    Devuelve {"rows_in", "rows_ok", "rows_loaded"}; rows_ok son las filas
+    que salieron del pipeline (sin rechazadas ni duplicadas).
+    `counts` trae los contadores iniciales (al retomar desde un checkpoint)
+    y se actualiza en el lugar, así `on_chunk` puede leerlo.
+    """
+    if counts is None:
+        counts = {"rows_in": 0, "rows_ok": 0, "rows_loaded": 0}
+    for chunk in metrics.timed_chunks(chunks):
+        counts["rows_in"] += len(chunk)
+        if on_stage is not None:
+            on_stage("transforming", counts["rows_in"], counts["rows_loaded"])
+        with metrics.stage("transform"):
+            chunk = run_pipeline(steps, chunk, ctx)
+        counts["rows_ok"] += len(chunk)
+
+        with metrics.stage("write"):
+            out.write(chunk)
+
+        if on_stage is not None:
+            on_stage("loading", counts["rows_in"], counts["rows_loaded"])
+        with metrics.stage("load"):
+            # los agregados van dentro de la carga: solo las filas que cada base insertó
+            counts["rows_loaded"] += load_chunk(chunk, ctx["filename"], batch_size,
+                                                rollups.for_chunk(chunk))
+        if on_chunk is not None:
+            on_chunk(chunk, counts["rows_in"], counts["rows_loaded"])
+    return counts
+
+
+def log_processed_file(csv_path: str, rows_in: int, processed_at: datetime, out_path: str,
+                       content_hash: str = None, rows_ok: int = None, rows_rejected: int = None,
+                       deadletter_file: str = None):
+    """
+    Trazabilidad del archivo terminado en MySQL y Mongo.
+    """
+    base_name = os.path.basename(csv_path)
+
+    # LOG a MySQL
+    with metrics.stage("mysql_log"):
+        mysql_log_upload(
+            filename=base_name,
+            rows_in=rows_in,
+            processed_at=processed_at,
+            rows_ok=rows_ok,
+            rows_rejected=rows_rejected
+        )
+
+    # LOG a Mongo
+    with metrics.stage("mongo_log"):
+        mongo_log_upload(
+            filename=base_name,
+            rows_in=rows_in,
+            output_file=out_path,
+            rows_ok=rows_ok,
+            rows_rejected=rows_rejected,
+            deadletter_file=deadletter_file
+        )
+
+    if content_hash:
+        set_file_status(content_hash, "done")
+
+
+@celery_app.task(bind=True, name="worker.tasks.procesar_csv", max_retries=TASK_MAX_RETRIES)
+def procesar_csv(self, csv_path: str, chunk_size: int = None, pipeline=None, batch_size: int = None,
+                 content_hash: str = None, split: bool = True, output_format: str = None,
+                 profile: bool = False):
+    """
+    Procesa el CSV en streaming y escribe resultado en /data/processed/...
+    También acepta .csv.gz y .csv.zst: se descomprimen mientras se leen
+    (la salida queda sin comprimir; retention.py la archiva después).
+    Cada bloque pasa por el pipeline de transformers.py (por nombre o lista
+    de pasos; por defecto ETL_PIPELINE), se agrega al archivo de salida y se
+    carga en lotes en MySQL y Mongo, así que el CSV nunca se carga completo
+    en memoria.
     También guarda trazabilidad en MySQL y Mongo.
+
+    `content_hash` (sha256 calculado por la API) permite cortar enseguida si
+    ese contenido ya se procesó. Cada registro además lleva un uniqueId, así
+    que reintentos o cargas repetidas no crean duplicados.
+
+    Si el archivo supera SPLIT_THRESHOLD_BYTES (y `split` es True) se divide
+    en shards que se reparten entre los workers; el id de esta tarea pasa a
+    ser el job_id para consultar el avance (/api/jobs/{job_id}).
+
+    `output_format` ("csv" o "parquet", por defecto OUTPUT_FORMAT) elige el
+    formato de processed_*; en Parquet cada bloque es un row group.
+
+    El avance y los registros procesados se publican como eventos para el
+    WebSocket hub de la API (tópicos task:<id> y sensor:<id>).
+
+    Ante errores transitorios de MySQL, Mongo o el broker la tarea se
+    reintenta con backoff y retoma desde el último bloque confirmado
+    (checkpoints.py); el dedup del pipeline no ve las filas de antes del
+    checkpoint (los uniqueId siguen evitando duplicados en las bases).
+    Si el mismo mensaje llega dos veces mientras la primera corrida sigue
+    viva, la segunda devuelve "busy" sin tocar los archivos.
+
+    Los tiempos de cada etapa van a las métricas del worker (metrics.py);
+    con `profile` la tarea además se perfila por muestreo (profiler.py).
+    """
+    task_id = self.request.id or str(uuid.uuid4())
+    metrics.observe_queue_wait(self)
+    t0 = time.perf_counter()
+    try:
+        with profiled(task_id, profile) as profiler:
+            result = process_file(task_id, csv_path, chunk_size, pipeline, batch_size,
+                                  content_hash, split, output_format)
+    except (Error, PyMongoError, BrokerError) as e:
+        retry_later(self, e, task_id)
+        # sin más intentos: error definitivo
+        checkpoints.clear(task_id)
+        result = {
+            "status": "error",
+            "detail": f"Error cargando registros: {e}"
+        }
+    except Exception as e:
+        # cualquier otro error tampoco se reintenta
+        checkpoints.clear(task_id)
+        result = {
+            "status": "error",
+            "detail": f"Error procesando el archivo: {e}"
+        }
+    if result["status"] == "error" and content_hash:
+        # el hash no puede quedar en "processing": una nueva subida lo reencola
+        try:
+            set_file_status(content_hash, "error")
+        except Error as status_error:
+            print("Error actualizando ingested_files desde worker:", status_error)
+    size_bytes = os.path.getsize(csv_path) if os.path.exists(csv_path) else None
+    metrics.observe_task(self.name, result, time.perf_counter() - t0, size_bytes)
+    if profiler is not None:
+        result["profile_file"] = profiler.path
+    if result["status"] not in ("split", "busy"):
+        # en modo split el estado final y el "done" los publica merge_shards;
+        # "busy" es una entrega repetida: lo publica la que sigue corriendo
+        states.set_result(task_id, result, os.path.basename(csv_path))
+        events.publish_done(task_id, result)
+    return result
+
+
+def process_file(task_id: str, csv_path: str, chunk_size: int = None, pipeline=None,
+                 batch_size: int = None, content_hash: str = None, split: bool = True,
+                 output_format: str = None):
+    """
+    Cuerpo de procesar_csv (ver su docstring).
     """
     if not os.path.exists(csv_path):
         return {
@@ -83,41 +455,445 @@ def procesar_csv(csv_path: str):
             "detail": f"no existe {csv_path}"
         }
 
-    # leer CSV
+    if content_hash:
+        try:
+            if get_file_status(content_hash) == "done":
+                return {
+                    "status": "duplicate",
+                    "detail": "el contenido ya fue procesado",
+                    "content_hash": content_hash
+                }
+        except Error as e:
+            # sin registro de archivos igual se procesa (los uniqueId evitan duplicados)
+            print("Error consultando ingested_files desde worker:", e)
+        set_file_status(content_hash, "processing")
+
+    chunk_size = chunk_size or CSV_CHUNK_SIZE
+    batch_size = batch_size or LOAD_BATCH_SIZE
+    output_format = output_format or OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        return {
+            "status": "error",
+            "detail": f"Formato de salida desconocido: {output_format}"
+        }
     try:
-        df = pd.read_csv(csv_path)
-    except Exception as e:
+        steps = build_pipeline(pipeline)
+    except ValueError as e:
         return {
             "status": "error",
-            "detail": f"Error leyendo CSV: {e}"
+            "detail": f"Pipeline inválido: {e}"
         }
 
-    # transformación de ejemplo
+    # un solo timestamp para todo el archivo (igual en todos los bloques)
     processed_at = datetime.now()
-    df["processed_at"] = processed_at.isoformat()
 
     base_name = os.path.basename(csv_path)
-    out_path = os.path.join(PROCESSED_DIR, f"processed_{base_name}")
-    df.to_csv(out_path, index=False)
+    out_path = output_path(csv_path, output_format)
+    ctx = {"processed_at": processed_at, "filename": base_name}
 
-    rows_in = len(df)
+    # un archivo comprimido no se puede cortar por rangos de bytes: se lee entero
+    if (split and SPLIT_THRESHOLD_BYTES and not compression_of(csv_path)
+            and os.path.getsize(csv_path) >= SPLIT_THRESHOLD_BYTES):
+        try:
+            return split_csv(task_id, csv_path, processed_at, pipeline, chunk_size, batch_size,
+                             content_hash, output_format)
+        except (Error, OSError, ValueError) as e:
+            # ValueError/OSError: Arrow no pudo leer el archivo al inferir los tipos
+            if content_hash:
+                set_file_status(content_hash, "error")
+            return {
+                "status": "error",
+                "detail": f"Error dividiendo el CSV: {e}"
+            }
 
-    # LOG a MySQL
-    mysql_log_upload(
-        filename=base_name,
-        rows_in=rows_in,
-        processed_at=processed_at
-    )
+    # una sola entrega de la tarea escribe la salida a la vez (ver checkpoints.py)
+    owner = uuid.uuid4().hex
+    if not checkpoints.acquire(task_id, owner):
+        return {
+            "status": "busy",
+            "detail": "otra entrega de la misma tarea la está procesando"
+        }
+    try:
+        # reintento de la misma tarea: se sigue desde el último bloque confirmado
+        resume = resume_point(task_id, csv_path, out_path, deadletter_path(csv_path), output_format)
+        checkpointing = output_format == "csv"
+        counts = {"rows_in": 0, "rows_ok": 0, "rows_loaded": 0}
+        if resume:
+            processed_at = resume["processed_at"]
+            ctx["processed_at"] = processed_at
+            counts = {key: resume[key] for key in counts}
 
-    # LOG a Mongo
-    mongo_log_upload(
-        filename=base_name,
-        rows_in=rows_in,
-        output_file=out_path
-    )
+        # líneas mal formadas y filas inválidas van aparte; el resto del archivo sigue
+        if resume:
+            rejected = DeadLetter(deadletter_path(csv_path), offset=resume["deadletter_bytes"],
+                                  count=resume["rows_rejected"], bad_lines=resume["bad_lines"])
+        else:
+            rejected = DeadLetter(deadletter_path(csv_path))
+        ctx["deadletter"] = rejected
+
+        def report(chunk, rows_in, rows_loaded):
+            if checkpointing:
+                checkpoints.save(task_id, {
+                    **counts,
+                    "csv_size": csv_size,
+                    "processed_at": processed_at,
+                    "rows_rejected": rejected.count,
+                    "bad_lines": rejected.bad_lines,
+                    "output_bytes": out.tell(),
+                    "deadletter_bytes": rejected.tell(),
+                }, owner)
+            else:
+                checkpoints.renew(task_id, owner)
+            events.publish_progress(task_id, "processing", rows_in=rows_in, rows_loaded=rows_loaded)
+            events.publish_records(chunk, base_name)
+
+        def stage(name, rows_in, rows_loaded):
+            states.set_state(task_id, name, rows_in=rows_in, rows_loaded=rows_loaded)
+
+        csv_size = os.path.getsize(csv_path)
+        events.publish_progress(task_id, "reading", rows_in=counts["rows_in"],
+                                rows_loaded=counts["rows_loaded"])
+        states.set_state(task_id, "reading", rows_in=counts["rows_in"],
+                         rows_loaded=counts["rows_loaded"], filename=base_name)
+        try:
+            column_types = output_column_types(csv_path)
+            with open_output(out_path, output_format,
+                             offset=resume["output_bytes"] if resume else None,
+                             column_types=column_types) as out, rejected:
+                run_etl(
+                    iter_csv_chunks(csv_path, chunk_size, on_bad_lines=rejected.add_lines,
+                                    skip_rows=counts["rows_in"] + rejected.bad_lines),
+                    steps, ctx, out, batch_size, on_chunk=report, on_stage=stage, counts=counts
+                )
+        except checkpoints.LeaseLost:
+            # otra entrega tomó la tarea: los archivos ya son suyos, no se tocan
+            return {
+                "status": "busy",
+                "detail": "otra entrega de la misma tarea la está procesando"
+            }
+        except (Error, PyMongoError) as e:
+            if is_transient(e):
+                # procesar_csv reintenta y se retoma desde el checkpoint
+                raise
+            checkpoints.clear(task_id)
+            if content_hash:
+                set_file_status(content_hash, "error")
+            return {
+                "status": "error",
+                "detail": f"Error cargando registros: {e}"
+            }
+        except Exception as e:
+            # no dejar un archivo de salida a medias
+            for path in (out_path, rejected.path):
+                if os.path.exists(path):
+                    os.remove(path)
+            checkpoints.clear(task_id)
+            if content_hash:
+                set_file_status(content_hash, "error")
+            return {
+                "status": "error",
+                "detail": f"Error leyendo CSV: {e}"
+            }
+
+        # rows_in cuenta todas las filas de datos, también las que el parser saltó
+        rows_in = counts["rows_in"] + rejected.bad_lines
+        deadletter_file = rejected.path if rejected.count else None
+        log_processed_file(csv_path, rows_in, processed_at, out_path, content_hash,
+                           counts["rows_ok"], rejected.count, deadletter_file)
+        checkpoints.clear(task_id)
+
+        return {
+            "status": "ok",
+            "rows_in": rows_in,
+            "rows_ok": counts["rows_ok"],
+            "rows_rejected": rejected.count,
+            "rows_loaded": counts["rows_loaded"],
+            "output_file": out_path,
+            "deadletter_file": deadletter_file
+        }
+    finally:
+        checkpoints.release(task_id, owner)
+
+
+def output_column_types(csv_path: str):
+    """
+    Tipos de columna para la salida (ver reader.infer_column_types), o None
+    si no se infieren. En CSV dan el mismo texto que pandas; en Parquet, el
+    esquema tipado.
+    """
+    if not OUTPUT_INFER_TYPES:
+        return None
+    with metrics.stage("types"):
+        return infer_column_types(csv_path)
+
+
+def split_csv(job_id: str, csv_path: str, processed_at: datetime, pipeline, chunk_size: int,
+              batch_size: int, content_hash: str = None, output_format: str = "csv"):
+    """
+    Divide el archivo en rangos de bytes (alineados a fin de línea) y lanza
+    un grupo de tareas procesar_shard. El último shard en terminar lanza
+    merge_shards, que arma la salida única y escribe un solo log.
+    (El worker no tiene result backend, por eso el "chord" se resuelve con
+    el contador de csv_jobs en vez de un callback de Celery.)
+    """
+    columns, data_start = read_header(csv_path)
+    ranges = shard_ranges(csv_path, data_start, SPLIT_SHARD_BYTES)
+    # los tipos se infieren una vez para todo el archivo: cada shard solo ve su rango
+    column_types = output_column_types(csv_path)
+    shards.create_job(job_id, csv_path, output_path(csv_path, output_format), content_hash,
+                      processed_at, ranges)
+    # los shards van sumando sus filas al estado del trabajo a medida que terminan
+    states.set_state(job_id, "split", rows_in=0, rows_loaded=0,
+                     filename=os.path.basename(csv_path))
+
+    group(
+        procesar_shard.s(job_id, index, csv_path, start, end, columns,
+                         processed_at.isoformat(), pipeline, chunk_size, batch_size,
+                         output_format, column_types)
+        for index, (start, end) in enumerate(ranges)
+    ).apply_async()
+
+    return {
+        "status": "split",
+        "job_id": job_id,
+        "shards": len(ranges)
+    }
+
+
+@celery_app.task(bind=True, name="worker.tasks.procesar_shard", max_retries=TASK_MAX_RETRIES,
+                 acks_late=True, reject_on_worker_lost=True)
+def procesar_shard(self, job_id: str, index: int, csv_path: str, start: int, end: int,
+                   columns: list, processed_at: str, pipeline=None, chunk_size: int = None,
+                   batch_size: int = None, output_format: str = "csv",
+                   column_types: dict = None):
+    """
+    Procesa un rango de bytes del CSV y deja su salida en un archivo .part.
+    En CSV el shard 0 escribe la cabecera, así el merge es una concatenación.
+    El dedup del pipeline es por shard (no ve filas de otros shards);
+    los uniqueId siguen evitando duplicados en las bases.
+    Igual que procesar_csv, ante errores transitorios se reintenta y retoma
+    desde el último bloque confirmado del shard.
+    Si otro shard falla, el trabajo queda en "error": el que falló borra los
+    .part de todos y los demás dejan de procesar al empezar o en su próximo
+    bloque (quedan "cancelled").
+    Una entrega repetida de un shard ya terminado no hace nada; si otra
+    entrega del mismo shard tiene el lease, esta se reintenta cuando vence.
+    """
+    metrics.observe_queue_wait(self)
+    key = checkpoints.shard_key(job_id, index)
+    try:
+        if shards.get_shard_status(job_id, index) == "done":
+            return {"status": "skipped", "job_id": job_id, "shard": index,
+                    "detail": "el shard ya estaba terminado"}
+        owner = uuid.uuid4().hex
+        acquired = checkpoints.acquire(key, owner)
+    except Error as e:
+        retry_later(self, e)
+        raise
+    if not acquired:
+        raise self.retry(countdown=checkpoints.TASK_LEASE_SECONDS)
+
+    t0 = time.perf_counter()
+    try:
+        with profiled(f"{job_id}.shard{index:05d}"):
+            result = process_shard(self, job_id, index, csv_path, start, end, columns,
+                                   processed_at, pipeline, chunk_size, batch_size, output_format,
+                                   column_types, owner)
+    finally:
+        checkpoints.release(key, owner)
+    metrics.observe_task(self.name, result, time.perf_counter() - t0, end - start)
+    return result
+
+
+def process_shard(task, job_id: str, index: int, csv_path: str, start: int, end: int,
+                  columns: list, processed_at: str, pipeline=None, chunk_size: int = None,
+                  batch_size: int = None, output_format: str = "csv",
+                  column_types: dict = None, owner: str = None):
+    """
+    Cuerpo de procesar_shard (ver su docstring); `task` es la tarea, para
+    reintentar, y `owner` el dueño del lease del shard.
+    """
+    chunk_size = chunk_size or CSV_CHUNK_SIZE
+    batch_size = batch_size or LOAD_BATCH_SIZE
+    ctx = {
+        "processed_at": datetime.fromisoformat(processed_at),
+        "filename": os.path.basename(csv_path),
+    }
+    key = checkpoints.shard_key(job_id, index)
+    part_path = shard_part_path(output_path(csv_path, output_format), index)
+    rejected_path = shard_part_path(deadletter_path(csv_path), index)
+    csv_size = os.path.getsize(csv_path)
+
+    def report(chunk, rows_in, rows_loaded):
+        if shards.get_job_status(job_id) == "error":
+            raise JobCancelled()
+        if output_format == "csv":
+            checkpoints.save(key, {
+                **counts,
+                "csv_size": csv_size,
+                "processed_at": ctx["processed_at"],
+                "rows_rejected": rejected.count,
+                "bad_lines": rejected.bad_lines,
+                "output_bytes": out.tell(),
+                "deadletter_bytes": rejected.tell(),
+            }, owner)
+        elif owner is not None:
+            checkpoints.renew(key, owner)
+        shards.update_shard(job_id, index, "running", rows_in, rows_loaded)
+        events.publish_progress(job_id, "processing", shard=index, rows_in=rows_in,
+                                rows_loaded=rows_loaded)
+        events.publish_records(chunk, ctx["filename"])
+
+    try:
+        if shards.get_job_status(job_id) == "error":
+            raise JobCancelled()
+        steps = build_pipeline(pipeline)
+        resume = resume_point(key, csv_path, part_path, rejected_path, output_format)
+        counts = {"rows_in": 0, "rows_ok": 0, "rows_loaded": 0}
+        if resume:
+            counts = {field: resume[field] for field in counts}
+            rejected = DeadLetter(rejected_path, {"_shard": index},
+                                  offset=resume["deadletter_bytes"],
+                                  count=resume["rows_rejected"], bad_lines=resume["bad_lines"])
+        else:
+            rejected = DeadLetter(rejected_path, {"_shard": index})
+        ctx["deadletter"] = rejected
+        with open_output(part_path, output_format, header=index == 0,
+                         offset=resume["output_bytes"] if resume else None,
+                         column_types=column_types) as out, rejected:
+            run_etl(
+                iter_csv_chunks(csv_path, chunk_size, start, end, columns,
+                                on_bad_lines=rejected.add_lines,
+                                skip_rows=counts["rows_in"] + rejected.bad_lines),
+                steps, ctx, out, batch_size, on_chunk=report, counts=counts
+            )
+        rows_in = counts["rows_in"] + rejected.bad_lines
+        rows_loaded = counts["rows_loaded"]
+        last = shards.finish_shard(job_id, index, rows_in, rows_loaded, counts["rows_ok"],
+                                   rejected.count)
+    except checkpoints.LeaseLost:
+        # otra entrega del mismo shard lo está procesando: sus archivos no se tocan
+        return {
+            "status": "busy",
+            "job_id": job_id,
+            "shard": index,
+            "detail": "otra entrega del mismo shard lo está procesando"
+        }
+    except JobCancelled:
+        # el error ya lo informó el shard que falló; acá solo se limpia lo propio
+        for path in (part_path, rejected_path):
+            if os.path.exists(path):
+                os.remove(path)
+        checkpoints.clear(key)
+        shards.update_shard(job_id, index, "cancelled", 0, 0)
+        return {
+            "status": "cancelled",
+            "job_id": job_id,
+            "shard": index,
+            "detail": "otro shard del trabajo falló"
+        }
+    except Exception as e:
+        # con errores transitorios se conservan el .part y el checkpoint para retomar
+        retry_later(task, e)
+        for path in (part_path, rejected_path):
+            if os.path.exists(path):
+                os.remove(path)
+        checkpoints.clear(key)
+        shards.update_shard(job_id, index, "error", 0, 0)
+        shards.set_job_status(job_id, "error")
+        job = shards.get_job(job_id)
+        if job:
+            # los demás shards paran en su próximo bloque; sus .part ya no sirven
+            discard_shard_outputs(job_id, csv_path, job["out_path"], job["shards_total"])
+        if job and job["content_hash"]:
+            set_file_status(job["content_hash"], "error")
+        result = {
+            "status": "error",
+            "job_id": job_id,
+            "shard": index,
+            "detail": f"Error procesando shard: {e}"
+        }
+        states.set_result(job_id, result)
+        events.publish_done(job_id, result)
+        return result
+
+    checkpoints.clear(key)
+    states.add_rows(job_id, rows_in, rows_loaded)
+    if last:
+        merge_shards.delay(job_id)
 
     return {
         "status": "ok",
+        "job_id": job_id,
+        "shard": index,
         "rows_in": rows_in,
-        "output_file": out_path
-    }
\ No newline at end of file
+        "rows_ok": counts["rows_ok"],
+        "rows_rejected": rejected.count,
+        "rows_loaded": rows_loaded
+    }
+
+
+@celery_app.task(bind=True, name="worker.tasks.merge_shards", max_retries=TASK_MAX_RETRIES)
+def merge_shards(self, job_id: str):
+    """
+    Une las salidas de los shards en processed_<archivo> y registra un único
+    upload_logs / uploads para todo el archivo.
+    Se puede repetir: si los .part ya no están es que el merge se hizo y
+    solo falta el registro (p.ej. un reintento porque MySQL no respondía).
+    """
+    try:
+        job = shards.get_job(job_id)
+        if job is None:
+            return {"status": "error", "detail": f"no existe el trabajo {job_id}"}
+
+        out_path = job["out_path"]
+        parts = [shard_part_path(out_path, i) for i in range(job["shards_total"])]
+        if all(os.path.exists(part) for part in parts):
+            with metrics.stage("merge"):
+                if out_path.endswith(".parquet"):
+                    merge_parquet(parts, out_path)
+                else:
+                    concat_parts(parts, out_path)
+            for part in parts:
+                os.remove(part)
+
+        # solo los shards con rechazos dejaron archivo de dead-letter
+        deadletter_file = deadletter_path(job["csv_path"])
+        rejected_parts = [shard_part_path(deadletter_file, i) for i in range(job["shards_total"])]
+        rejected_parts = [part for part in rejected_parts if os.path.exists(part)]
+        if rejected_parts:
+            concat_parts(rejected_parts, deadletter_file)
+            for part in rejected_parts:
+                os.remove(part)
+        elif not os.path.exists(deadletter_file):
+            deadletter_file = None
+
+        log_processed_file(job["csv_path"], job["rows_in"], job["processed_at"], out_path,
+                           job["content_hash"], job["rows_ok"], job["rows_rejected"],
+                           deadletter_file)
+        shards.set_job_status(job_id, "done")
+    except (Error, PyMongoError) as e:
+        retry_later(self, e, job_id)
+        shards.set_job_status(job_id, "error")
+        result = {
+            "status": "error",
+            "job_id": job_id,
+            "detail": f"Error registrando el trabajo: {e}"
+        }
+        states.set_result(job_id, result)
+        events.publish_done(job_id, result)
+        return result
+
+    result = {
+        "status": "ok",
+        "job_id": job_id,
+        "rows_in": job["rows_in"],
+        "rows_ok": job["rows_ok"],
+        "rows_rejected": job["rows_rejected"],
+        "rows_loaded": job["rows_loaded"],
+        "output_file": out_path,
+        "deadletter_file": deadletter_file
+    }
+    states.set_result(job_id, result)
+    events.publish_done(job_id, result)
+    return result
@@ -0,0 +1,262 @@
+import json
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Registro de transformaciones: nombre -> función(df, ctx, **params) -> df
+# Cada transformación trabaja sobre el bloque completo con operaciones
+# vectorizadas de pandas/NumPy (nunca fila por fila).
+# `ctx` es un dict por archivo (processed_at, filename, estado entre bloques).
+TRANSFORMS = {}
+
+# Pipeline que se usa si la tarea no pide otro (nombre o JSON con la lista de pasos)
+ETL_PIPELINE = os.getenv("ETL_PIPELINE", "default")
+# Filas recientes contra las que compara dedup (8 bytes por fila: 1M = 8 MB por tarea)
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", "1000000"))
+
+
+def register(name: str):
+    """
+    Decorador para agregar una transformación al registro.
+    """
+    def decorator(fn):
+        TRANSFORMS[name] = fn
+        return fn
+    return decorator
+
+
+def reject(ctx: dict, rows: pd.DataFrame, reason: str):
+    """
+    Manda al dead-letter del archivo (ctx["deadletter"], si la tarea tiene uno)
+    las filas que una transformación descarta por inválidas.
+    """
+    sink = ctx.get("deadletter")
+    if sink is not None:
+        sink.add_rows(rows, reason)
+
+
+@register("processed_at")
+def add_processed_at(df: pd.DataFrame, ctx: dict, column: str = "processed_at"):
+    """
+    Agrega la marca de procesamiento (la misma para todos los bloques del archivo).
+    """
+    df[column] = ctx["processed_at"].isoformat()
+    return df
+
+
+_TRUE_VALUES = ["true", "1", "yes", "si", "sí", "t"]
+_FALSE_VALUES = ["false", "0", "no", "f"]
+
+
+def _to_bool(series: pd.Series) -> pd.Series:
+    lowered = series.astype("string").str.strip().str.lower()
+    out = pd.Series(pd.NA, index=series.index, dtype="boolean")
+    out[lowered.isin(_TRUE_VALUES)] = True
+    out[lowered.isin(_FALSE_VALUES)] = False
+    return out
+
+
+def _to_int(series: pd.Series) -> pd.Series:
+    num = pd.to_numeric(series, errors="coerce")
+    # los valores con decimales no son enteros válidos
+    return num.where(num % 1 == 0).astype("Int64")
+
+
+_COERCERS = {
+    "int": _to_int,
+    "float": lambda s: pd.to_numeric(s, errors="coerce").astype("float64"),
+    "datetime": lambda s: pd.to_datetime(s, errors="coerce"),
+    "str": lambda s: s.astype("string"),
+    "bool": _to_bool,
+}
+
+
+@register("coerce_types")
+def coerce_types(df: pd.DataFrame, ctx: dict, columns: dict, on_error: str = "null"):
+    """
+    Convierte columnas al tipo indicado: {"temperature": "float", ...}.
+    Los valores que no se pueden convertir quedan como nulos
+    (on_error="null") o la fila va al dead-letter (on_error="reject").
+    """
+    if on_error not in ("null", "reject"):
+        raise ValueError(f"on_error desconocido en coerce_types: {on_error}")
+    # al dead-letter van los valores como venían, no los ya convertidos
+    raw = df.copy() if on_error == "reject" else None
+    for column, kind in columns.items():
+        if column not in df.columns:
+            continue
+        if kind not in _COERCERS:
+            raise ValueError(f"Tipo desconocido para {column}: {kind}")
+        converted = _COERCERS[kind](df[column])
+        if on_error == "reject":
+            bad = (converted.isna() & df[column].notna()).to_numpy()
+            if bad.any():
+                reject(ctx, raw.loc[df.index[bad]], f"{column}: no es {kind}")
+                df, converted = df[~bad], converted[~bad]
+        df[column] = converted
+    return df
+
+
+@register("validate_range")
+def validate_range(df: pd.DataFrame, ctx: dict, column: str, min=None, max=None, action: str = "drop"):
+    """
+    Valida que `column` esté entre min y max (inclusive).
+    action="drop" descarta las filas fuera de rango, action="null" las deja en nulo.
+    """
+    if column not in df.columns:
+        return df
+    values = pd.to_numeric(df[column], errors="coerce")
+    bad = pd.Series(False, index=df.index)
+    if min is not None:
+        bad |= values < min
+    if max is not None:
+        bad |= values > max
+
+    if action == "drop":
+        reject(ctx, df[bad], f"{column} fuera de rango [{min}, {max}]")
+        return df[~bad]
+    if action == "null":
+        df[column] = df[column].mask(bad)
+        return df
+    raise ValueError(f"Acción desconocida en validate_range: {action}")
+
+
+# (factor, offset): destino = origen * factor + offset
+UNIT_CONVERSIONS = {
+    "c_to_f": (1.8, 32.0),
+    "f_to_c": (1 / 1.8, -32.0 / 1.8),
+    "k_to_c": (1.0, -273.15),
+    "c_to_k": (1.0, 273.15),
+    "pa_to_hpa": (0.01, 0.0),
+    "hpa_to_pa": (100.0, 0.0),
+    "kmh_to_ms": (1 / 3.6, 0.0),
+    "ms_to_kmh": (3.6, 0.0),
+    "mm_to_m": (0.001, 0.0),
+}
+
+
+@register("convert_units")
+def convert_units(df: pd.DataFrame, ctx: dict, column: str, conversion: str = None,
+                  factor: float = 1.0, offset: float = 0.0, target: str = None):
+    """
+    Convierte unidades con una transformación lineal.
+    Se puede usar una conversión con nombre (UNIT_CONVERSIONS) o factor/offset.
+    Si se indica `target` el resultado va a una columna nueva.
+    """
+    if column not in df.columns:
+        return df
+    if conversion is not None:
+        if conversion not in UNIT_CONVERSIONS:
+            raise ValueError(f"Conversión desconocida: {conversion}")
+        factor, offset = UNIT_CONVERSIONS[conversion]
+    values = pd.to_numeric(df[column], errors="coerce")
+    df[target or column] = values * factor + offset
+    return df
+
+
+@register("dedup")
+def dedup(df: pd.DataFrame, ctx: dict, subset: list = None, window: int = None):
+    """
+    Elimina filas repetidas dentro del bloque y contra las últimas `window`
+    filas de los bloques anteriores (por defecto DEDUP_WINDOW; se guardan
+    solo los hashes de 64 bits, así la memoria no crece con el archivo).
+    Un repetido más lejano no se detecta acá; si la fila es idéntica lo
+    frenan igual los índices únicos de uniqueId al cargar.
+    Las filas descartadas van al dead-letter como "fila duplicada", así
+    cuentan en rows_rejected.
+    """
+    window = DEDUP_WINDOW if window is None else window
+    columns = subset or [c for c in df.columns if c != "processed_at"]
+    hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    # hashes de los bloques anteriores (del más viejo al más nuevo) y los
+    # mismos ordenados, para buscarlos con searchsorted
+    recent = ctx.setdefault("_dedup_recent", deque())
+    seen = ctx.get("_dedup_sorted")
+    duplicated = pd.Series(hashes).duplicated().to_numpy()
+    if seen is not None and len(seen):
+        pos = np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)
+        duplicated = duplicated | (seen[pos] == hashes)
+    keep = ~duplicated
+
+    if window > 0:
+        recent.append(hashes[keep][-window:])
+        size = sum(len(block) for block in recent)
+        while size - len(recent[0]) >= window:
+            size -= len(recent.popleft())
+        if size > window:
+            recent[0] = recent[0][size - window:]
+        ctx["_dedup_sorted"] = np.sort(np.concatenate(recent))
+    if duplicated.any():
+        reject(ctx, df[duplicated], "fila duplicada")
+    return df[keep]
+
+
+@register("derive")
+def derive_column(df: pd.DataFrame, ctx: dict, name: str, expr: str):
+    """
+    Crea una columna derivada a partir de una expresión vectorizada,
+    por ejemplo {"name": "dew_gap", "expr": "temperature - dew_point"}.
+    """
+    df[name] = df.eval(expr)
+    return df
+
+
+# Pipelines predefinidos. Cada paso es {"transform": <nombre>, ...parámetros}.
+PIPELINES = {
+    # lo que hacía procesar_csv originalmente
+    "default": [
+        {"transform": "processed_at"},
+    ],
+    # datos de sensores (columnas del generador)
+    "sensores": [
+        {"transform": "coerce_types", "columns": {
+            "timestamp": "datetime",
+            "temperature": "float",
+            "humidity": "float",
+            "pressure": "float",
+        }, "on_error": "reject"},
+        {"transform": "validate_range", "column": "humidity", "min": 0, "max": 100},
+        {"transform": "validate_range", "column": "temperature", "min": -60, "max": 80},
+        {"transform": "dedup", "subset": ["sensorId", "timestamp"]},
+        {"transform": "convert_units", "column": "temperature", "conversion": "c_to_f",
+         "target": "temperature_f"},
+        {"transform": "processed_at"},
+    ],
+}
+
+
+def build_pipeline(spec=None):
+    """
+    Devuelve la lista de pasos [(nombre, función, params)].
+    `spec` puede ser el nombre de un pipeline de PIPELINES, un JSON con la
+    lista de pasos o directamente la lista. Sin spec se usa ETL_PIPELINE.
+    """
+    if spec is None:
+        spec = ETL_PIPELINE
+    if isinstance(spec, str):
+        if spec in PIPELINES:
+            spec = PIPELINES[spec]
+        elif spec.lstrip().startswith("["):
+            spec = json.loads(spec)
+        else:
+            raise ValueError(f"Pipeline desconocido: {spec}")
+
+    steps = []
+    for step in spec:
+        params = dict(step)
+        name = params.pop("transform")
+        if name not in TRANSFORMS:
+            raise ValueError(f"Transformación desconocida: {name}")
+        steps.append((name, TRANSFORMS[name], params))
+    return steps
+
+
+def run_pipeline(steps, df: pd.DataFrame, ctx: dict) -> pd.DataFrame:
+    """
+    Aplica los pasos en orden sobre un bloque.
+    """
+    for _name, fn, params in steps:
+        df = fn(df, ctx, **params)
+    return df
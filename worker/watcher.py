@@ -0,0 +1,254 @@
+"""
+Vigila /data/inbound y encola procesar_csv para los CSV que se copian
+directo a la carpeta (scp, rsync, cp), sin pasar por /api/upload.
+
+Uso (servicio `watcher` de docker-compose):
+    python watcher.py
+
+- Usa inotify (watchdog); si no está disponible, o con WATCHER_POLLING=1
+  (volúmenes montados desde Docker Desktop no propagan inotify), revisa la
+  carpeta cada WATCHER_POLL_INTERVAL segundos.
+- Un archivo se da por completo cuando su tamaño y mtime no cambian durante
+  WATCHER_SETTLE_SECONDS. Se ignoran los ocultos (.x.part de la API, .x.XXXXXX
+  de rsync) y los que no terminan en .csv, .csv.gz o .csv.zst.
+- Los archivos listos se encolan en lotes por una sola conexión al broker.
+- Los que subió la API (registrados en ingested_files.saved_as) se saltan.
+- El checkpoint guarda hasta qué ctime ya se encoló todo; al reiniciar solo
+  se revisan los archivos más nuevos. Se usa ctime y no mtime porque rsync -t
+  y cp -p conservan el mtime original, pero no pueden fijar el ctime.
+  Solo avanza por los archivos que se encolaron de verdad: si el envío de un
+  lote falla a la mitad, los que faltaron se reintentan.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from mysql.connector import Error
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+import db
+import states
+from paths import INBOUND_DIR
+from reader import INPUT_SUFFIXES
+from tasks import celery_app, procesar_csv
+
+WATCHER_POLLING = os.getenv("WATCHER_POLLING", "0") == "1"
+WATCHER_POLL_INTERVAL = float(os.getenv("WATCHER_POLL_INTERVAL", "5"))
+WATCHER_SETTLE_SECONDS = float(os.getenv("WATCHER_SETTLE_SECONDS", "3"))
+WATCHER_BATCH_SIZE = int(os.getenv("WATCHER_BATCH_SIZE", "500"))
+WATCHER_CHECKPOINT = os.getenv("WATCHER_CHECKPOINT", "/data/.watcher_checkpoint.json")
+# Mismo criterio que la API (INTERACTIVE_MAX_BYTES en api/producer.py)
+INTERACTIVE_MAX_BYTES = int(os.getenv("INTERACTIVE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+def is_candidate(name: str) -> bool:
+    return name.endswith(INPUT_SUFFIXES) and not name.startswith(".")
+
+
+class Checkpoint:
+    """
+    Marca de agua por ctime: todo archivo con ctime < ctime_ns ya se despachó.
+    `done` son los despachados desde la marca en adelante, {nombre: ctime}:
+    otro archivo con el mismo ctime que la marca todavía puede no haberse
+    visto, así que se compara por (nombre, ctime) y no por ctime solo. Un
+    archivo reemplazado con el mismo nombre tiene otro ctime y se vuelve a
+    despachar.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ctime_ns = 0
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as fh:
+                data = json.load(fh)
+            self.ctime_ns = data.get("ctime_ns", 0)
+            self.done = data.get("done", {})
+
+    def seen(self, name: str, ctime_ns: int) -> bool:
+        return ctime_ns < self.ctime_ns or self.done.get(name) == ctime_ns
+
+    def advance(self, dispatched: dict, pending_ctimes):
+        """
+        `dispatched` es {nombre: ctime_ns} de los archivos ya encolados;
+        la marca no pasa al archivo pendiente más viejo.
+        """
+        done = {**self.done, **dispatched}
+        newest = max([self.ctime_ns, *done.values()])
+        self.ctime_ns = min([newest, *pending_ctimes])
+        # los que quedaron por debajo de la marca ya no hace falta listarlos
+        self.done = {name: ctime for name, ctime in done.items() if ctime >= self.ctime_ns}
+        self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump({"ctime_ns": self.ctime_ns, "done": self.done}, fh)
+        os.replace(tmp_path, self.path)
+
+
+class InboundHandler(FileSystemEventHandler):
+    """
+    Solo anota nombres; el hilo principal decide cuándo están completos.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = set()
+
+    def _note(self, path: str):
+        name = os.path.basename(path)
+        if os.path.dirname(path) == INBOUND_DIR and is_candidate(name):
+            with self.lock:
+                self.names.add(name)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._note(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._note(event.src_path)
+
+    def on_moved(self, event):
+        # rsync y la API escriben un temporal oculto y lo renombran al final
+        if not event.is_directory:
+            self._note(event.dest_path)
+
+    def take(self) -> set:
+        with self.lock:
+            names, self.names = self.names, set()
+        return names
+
+
+def uploaded_by_api(names: list) -> set:
+    """
+    Nombres que ya registró /api/upload (los encola la API, no el watcher).
+    """
+    if not names:
+        return set()
+    conn = db.get_mysql_conn()
+    try:
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(
+            f"SELECT saved_as FROM ingested_files WHERE saved_as IN ({placeholders})",
+            tuple(names)
+        )
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
+def dispatch(paths: list) -> list:
+    """
+    Encola procesar_csv para cada archivo, todos por la misma conexión.
+    Devuelve los que se encolaron: si el envío falla a la mitad, los
+    primeros ya están en la cola y el resto no.
+    """
+    sent = []
+    try:
+        with celery_app.producer_or_acquire() as producer:
+            for path in paths:
+                task_id = str(uuid.uuid4())
+                size = os.path.getsize(path)
+                states.set_state(task_id, "queued", rows_in=0, rows_loaded=0,
+                                 filename=os.path.basename(path))
+                queue = "interactive" if size <= INTERACTIVE_MAX_BYTES else "bulk"
+                procesar_csv.apply_async(args=[path], task_id=task_id, queue=queue,
+                                         producer=producer)
+                sent.append(path)
+    except Exception as e:
+        print("Error encolando archivos desde watcher:", e)
+    print(f"Watcher: {len(sent)} archivos encolados")
+    return sent
+
+
+class Watcher:
+    def __init__(self):
+        self.checkpoint = Checkpoint(WATCHER_CHECKPOINT)
+        self.handler = InboundHandler()
+        # nombre -> (size, mtime_ns, ctime_ns, desde cuándo no cambia)
+        self.pending = {}
+
+    def scan(self):
+        """
+        Revisa la carpeta completa; el checkpoint descarta lo ya encolado.
+        """
+        with os.scandir(INBOUND_DIR) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self.handler._note(entry.path)
+
+    def observe(self, names: set):
+        now = time.monotonic()
+        for name in names | set(self.pending):
+            try:
+                st = os.stat(os.path.join(INBOUND_DIR, name))
+            except FileNotFoundError:
+                self.pending.pop(name, None)
+                continue
+            if self.checkpoint.seen(name, st.st_ctime_ns):
+                continue
+            previous = self.pending.get(name)
+            if previous is None or previous[:2] != (st.st_size, st.st_mtime_ns):
+                self.pending[name] = (st.st_size, st.st_mtime_ns, st.st_ctime_ns, now)
+
+    def ready(self) -> list:
+        limit = time.monotonic() - WATCHER_SETTLE_SECONDS
+        return sorted(
+            (name for name, (_, _, _, since) in self.pending.items() if since <= limit),
+            key=lambda name: self.pending[name][2]
+        )
+
+    def flush(self):
+        names = self.ready()
+        for start in range(0, len(names), WATCHER_BATCH_SIZE):
+            batch = names[start:start + WATCHER_BATCH_SIZE]
+            try:
+                skip = uploaded_by_api(batch)
+            except Error as e:
+                # sin MySQL no se puede saber si los subió la API: se reintenta después
+                print("Error consultando ingested_files desde watcher:", e)
+                return
+            to_send = [name for name in batch if name not in skip]
+            sent = dispatch([os.path.join(INBOUND_DIR, name) for name in to_send])
+
+            # los que no se encolaron siguen pendientes y la marca no los pasa
+            handled = skip | {os.path.basename(path) for path in sent}
+            dispatched = {name: self.pending.pop(name)[2] for name in batch if name in handled}
+            self.checkpoint.advance(dispatched, [p[2] for p in self.pending.values()])
+            if len(sent) < len(to_send):
+                return
+
+    def run(self):
+        observer = PollingObserver(timeout=WATCHER_POLL_INTERVAL) if WATCHER_POLLING else Observer()
+        observer.schedule(self.handler, INBOUND_DIR, recursive=False)
+        try:
+            observer.start()
+        except OSError as e:
+            # p.ej. sin inotify o sin watches disponibles
+            print("inotify no disponible, se usa polling:", e)
+            observer = PollingObserver(timeout=WATCHER_POLL_INTERVAL)
+            observer.schedule(self.handler, INBOUND_DIR, recursive=False)
+            observer.start()
+        print(f"Watcher: vigilando {INBOUND_DIR} con {type(observer).__name__}")
+
+        # archivos que llegaron mientras el watcher estaba apagado
+        self.scan()
+        try:
+            while True:
+                self.observe(self.handler.take())
+                self.flush()
+                time.sleep(1)
+        finally:
+            observer.stop()
+            observer.join()
+
+
+if __name__ == "__main__":
+    Watcher().run()